@@ -10,8 +10,8 @@ from components.mock_test import mock_test_system
 from components.analytics import analytics_dashboard
 from components.live_dashboard import show_live_dashboard
 from components.documentation import show_comprehensive_docs
-from data.study_data import get_flashcards, get_topics, get_summary_data
-from utils.progress_tracker import ProgressTracker
+from utils.study_artifact import get_flashcards, get_topics, get_summary_data
+from utils.progress_streamlit import get_progress_tracker
 
 # Page configuration
 st.set_page_config(
@@ -21,9 +21,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Fetched from the shared per-user cache on every run, which marks the tracker as in use
+st.session_state.progress_tracker = get_progress_tracker()
+
 # Initialize session state
-if 'progress_tracker' not in st.session_state:
-    st.session_state.progress_tracker = ProgressTracker()
 
 if 'current_study_session' not in st.session_state:
     st.session_state.current_study_session = {
@@ -102,7 +103,7 @@ def show_dashboard():
         )
     
     with col3:
-        total_sessions = len(st.session_state.progress_tracker.get_all_sessions())
+        total_sessions = st.session_state.progress_tracker.get_overall_stats()['total_sessions']
         st.metric(
             "Study Sessions", 
             total_sessions,
@@ -282,7 +283,7 @@ def show_learning_resources():
     
     with col2:
         st.markdown("### Difficulty Progression 📈")
-        from data.study_data import get_difficulty_levels
+        from utils.study_artifact import get_difficulty_levels
         difficulty_info = get_difficulty_levels()
         
         for level, description in difficulty_info.items():
@@ -7,7 +7,9 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import json
-from utils.progress_tracker import ProgressTracker
+from utils.progress_rollups import test_rollups_frame
+from utils.progress_streamlit import get_progress_tracker
+from utils.timestamps import from_epoch_ms, with_iso
 
 def analytics_dashboard():
     st.header("📊 Real-Time Analytics Dashboard")
@@ -15,7 +17,7 @@ def analytics_dashboard():
     
     # Initialize progress tracker if not exists
     if 'progress_tracker' not in st.session_state:
-        st.session_state.progress_tracker = ProgressTracker()
+        st.session_state.progress_tracker = get_progress_tracker()
     
     progress_tracker = st.session_state.progress_tracker
     
@@ -103,16 +105,17 @@ def analytics_dashboard():
     st.markdown("---")
     st.subheader("🎯 Topic Performance Analysis")
     
+    topic_performance = progress_tracker.get_all_topic_performance()
     topic_data = []
-    for topic, perf in progress_tracker.data.get('topic_performance', {}).items():
-        if perf['total_tests'] > 0:
-            avg_score = perf['total_score'] / perf['total_tests']
+    for topic, perf in topic_performance.items():
+        if perf.total_tests > 0:
+            avg_score = perf.total_score / perf.total_tests
             topic_data.append({
                 'Topic': topic,
                 'Average Score': avg_score,
-                'Best Score': perf['best_score'],
-                'Tests Taken': perf['total_tests'],
-                'Improvement Trend': perf['improvement_trend']
+                'Best Score': perf.best_score,
+                'Tests Taken': perf.total_tests,
+                'Improvement Trend': perf.improvement_trend
             })
     
     if topic_data:
@@ -162,17 +165,26 @@ def analytics_dashboard():
     st.subheader("📅 Study Progress Over Time")
     
     sessions = progress_tracker.get_all_sessions()
-    if sessions:
-        # Prepare data for time series
-        session_data = []
+    session_rollups = progress_tracker.get_session_rollups()
+    if sessions or session_rollups:
+        # Prepare data for time series; rolled-up days are already summed per day
+        session_data = [
+            {
+                'Date': datetime.fromisoformat(day).date(),
+                'Duration': agg['duration'],
+                'Flashcards': agg['flashcards_studied'],
+                'Tests': agg['tests_taken']
+            }
+            for day, agg in session_rollups.items()
+        ]
         for session in sessions:
-            if session.get('end_time'):
-                date = datetime.fromisoformat(session['start_time']).date()
+            if session.end_time:
+                date = from_epoch_ms(session.start_time).date()
                 session_data.append({
                     'Date': date,
-                    'Duration': session.get('duration', 0),
-                    'Flashcards': session.get('flashcards_studied', 0),
-                    'Tests': session.get('tests_taken', 0)
+                    'Duration': session.duration,
+                    'Flashcards': session.flashcards_studied,
+                    'Tests': session.tests_taken
                 })
         
         if session_data:
@@ -262,20 +274,20 @@ def analytics_dashboard():
     st.markdown("---")
     st.subheader("📝 Test Results Timeline")
     
-    test_results = progress_tracker.data.get('test_results', [])
-    if test_results:
-        # Prepare test results data
-        results_data = []
-        for result in test_results:
-            date = datetime.fromisoformat(result['date'])
-            results_data.append({
-                'Date': date,
-                'Topic': result['topic'],
-                'Score': result['score'],
-                'Accuracy': result['accuracy']
-            })
-        
-        df_results = pd.DataFrame(results_data)
+    test_results = progress_tracker.get_test_results()
+    test_rollups = progress_tracker.get_test_rollups()
+    if test_results or test_rollups:
+        # Build the chart data straight from the result columns
+        df_results = test_results.to_dataframe()
+        if test_rollups:
+            # Rolled-up days show one point per topic with that day's mean score
+            df_results = pd.concat([test_rollups_frame(test_rollups), df_results], ignore_index=True)
+        df_results = df_results.rename(columns={
+            'date': 'Date',
+            'topic': 'Topic',
+            'score': 'Score',
+            'accuracy': 'Accuracy'
+        })
         
         # Score progression over time
         fig_progression = px.scatter(
@@ -310,33 +322,24 @@ def analytics_dashboard():
     st.markdown("---")
     st.subheader("🔄 Flashcard Review Analytics")
     
-    flashcard_stats = progress_tracker.data.get('flashcard_stats', {})
+    flashcard_stats = progress_tracker.get_flashcard_stats()
     if flashcard_stats:
         # Prepare flashcard data
         card_data = []
         for term, stats in flashcard_stats.items():
-            accuracy = (stats['times_correct'] / stats['times_studied']) * 100 if stats['times_studied'] > 0 else 0
+            accuracy = (stats.times_correct / stats.times_studied) * 100 if stats.times_studied > 0 else 0
             card_data.append({
                 'Term': term,
-                'Times Studied': stats['times_studied'],
-                'Times Correct': stats['times_correct'],
+                'Times Studied': stats.times_studied,
+                'Times Correct': stats.times_correct,
                 'Accuracy': accuracy,
-                'Difficulty Level': stats['difficulty_level']
+                'Difficulty Level': stats.difficulty_level
             })
         
         df_cards = pd.DataFrame(card_data)
         
         # Cards needing review
-        now = datetime.now()
-        due_cards = []
-        
-        for term, stats in flashcard_stats.items():
-            if stats.get('next_review'):
-                next_review = datetime.fromisoformat(stats['next_review'])
-                if next_review <= now:
-                    due_cards.append(term)
-        
-        st.info(f"📅 {len(due_cards)} flashcards are due for review")
+        st.info(f"📅 {progress_tracker.get_due_flashcard_count()} flashcards are due for review")
         
         # Flashcard performance distribution
         fig_cards = px.histogram(
@@ -376,10 +379,16 @@ def analytics_dashboard():
             # Create comprehensive progress report
             progress_data = {
                 'overall_stats': stats,
-                'topic_performance': progress_tracker.data.get('topic_performance', {}),
+                'topic_performance': {
+                    topic: perf.to_dict()
+                    for topic, perf in topic_performance.items()
+                },
                 'recent_sessions': progress_tracker.get_recent_sessions(20),
-                'test_results': test_results[-20:] if test_results else [],
-                'flashcard_stats': flashcard_stats
+                'test_results': [with_iso(result.to_dict(), ['date']) for result in test_results[-20:]],
+                'flashcard_stats': {
+                    term: with_iso(card.to_dict(), ['last_studied', 'next_review'])
+                    for term, card in flashcard_stats.items()
+                }
             }
             
             import json
@@ -393,7 +402,7 @@ def analytics_dashboard():
     
     with col2:
         if test_results:
-            df_export = pd.DataFrame(test_results)
+            df_export = test_results.to_dataframe()
             csv = df_export.to_csv(index=False)
             
             st.download_button(
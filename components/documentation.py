@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from data.study_data import get_difficulty_levels
+from utils.study_artifact import get_difficulty_levels
 
 def show_comprehensive_docs():
     """Display comprehensive documentation with framework selection and difficulty levels"""
@@ -4,7 +4,7 @@ Flashcard study component with spaced repetition
 import streamlit as st
 import random
 from datetime import datetime
-from data.study_data import get_flashcards
+from utils.study_artifact import get_flashcards
 from utils.progress_tracker import ProgressTracker
 
 def flashcard_system():
@@ -9,6 +9,7 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import json
 import time
+from utils.progress_streamlit import current_session_stats, current_session_timeline
 
 def live_performance_dashboard():
     """Live dashboard with real-time performance metrics"""
@@ -34,7 +35,7 @@ def live_performance_dashboard():
         return
     
     # Live metrics display
-    current_stats = progress_tracker.get_current_session_stats()
+    current_stats = current_session_stats(progress_tracker)
     
     # Real-time metrics row
     metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
@@ -78,14 +79,15 @@ def live_performance_dashboard():
     
     # Create real-time performance chart
     session_data = progress_tracker.get_live_session_data()
-    if session_data:
-        df = pd.DataFrame(session_data)
+    accuracy = session_data['accuracy']
+    if len(accuracy):
+        question_index = list(range(len(accuracy)))
         
-        # Live accuracy trend
+        # Live accuracy trend, plotted straight from the tracker's arrays
         fig_live = go.Figure()
         fig_live.add_trace(go.Scatter(
-            x=df.index,
-            y=df['accuracy'],
+            x=question_index,
+            y=accuracy,
             mode='lines+markers',
             name='Live Accuracy',
             line=dict(color='#00ff00', width=3),
@@ -93,11 +95,11 @@ def live_performance_dashboard():
         ))
         
         # Add moving average
-        if len(df) >= 5:
-            df['moving_avg'] = df['accuracy'].rolling(window=5).mean()
+        if len(accuracy) >= 5:
+            moving_avg = pd.Series(accuracy).rolling(window=5).mean()
             fig_live.add_trace(go.Scatter(
-                x=df.index,
-                y=df['moving_avg'],
+                x=question_index,
+                y=moving_avg,
                 mode='lines',
                 name='5-Question Average',
                 line=dict(color='#ff6600', width=2, dash='dash')
@@ -226,7 +228,7 @@ def study_session_timeline():
     if not progress_tracker:
         return
     
-    timeline_data = progress_tracker.get_session_timeline()
+    timeline_data = current_session_timeline(progress_tracker)
     if timeline_data:
         # Create timeline visualization
         df_timeline = pd.DataFrame(timeline_data)
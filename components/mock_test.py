@@ -5,7 +5,9 @@ import streamlit as st
 import time
 from datetime import datetime, timedelta
 from utils.test_generator import TestGenerator
+from utils.paper_pool import shared_paper_pool
 from utils.progress_tracker import ProgressTracker
+from utils.progress_streamlit import get_seen_questions
 
 def mock_test_system():
     st.header("📝 Mock Test System")
@@ -28,6 +30,10 @@ def mock_test_system():
         }
     
     test_gen = st.session_state.test_generator
+    # Prefer questions the current user has not been shown yet
+    test_gen.seen = get_seen_questions()
+    # Start pre-generating the common papers while the test is being chosen
+    shared_paper_pool()
     progress_tracker = st.session_state.progress_tracker
     
     if not st.session_state.test_session['active']:
@@ -44,6 +50,9 @@ def _show_test_setup(test_gen, progress_tracker):
         ["🎓 Full Mock Test (120 questions)", "📚 Topic-Specific Test", "⚡ Quick Practice (20 questions)", "🎯 Difficulty-Based Test", "🚀 Framework-Based Test", "🧠 PhD-Level Test", "🏆 Certification Test", "🔧 Custom Test"]
     )
     
+    seed_text = st.text_input("Paper seed (optional):", help="Enter the seed shown with an earlier test to get the same paper again")
+    seed = int(seed_text.strip()) if seed_text.strip().isdigit() else None
+    
     if test_type == "🎓 Full Mock Test (120 questions)":
         st.info("Complete practice exam covering all topics with standard distribution")
         
@@ -56,6 +65,11 @@ def _show_test_setup(test_gen, progress_tracker):
             percentage = (weight / total_weight) * 100
             st.write(f"• **{topic}**: {weight} questions ({percentage:.1f}%)")
         
+        num_questions = test_gen.get_mock_test_capacity(120)
+        if num_questions < 120:
+            st.warning(f"⚠️ The question bank holds {num_questions} questions, "
+                       f"so this test will have {num_questions} questions instead of 120.")
+        
         # Time limit
         time_limit = st.selectbox("Time limit:", ["⏰ 2 hours (120 min)", "🚀 1.5 hours (90 min)", "⚡ 1 hour (60 min)", "🔄 No limit"])
         
@@ -68,7 +82,7 @@ def _show_test_setup(test_gen, progress_tracker):
             elif "60 min" in time_limit:
                 time_minutes = 60
             
-            questions = test_gen.generate_mock_test(120)
+            questions = _preset_paper(test_gen, seed, "generate_mock_test", 120)
             _start_test(questions, time_minutes, "Full Mock Test", progress_tracker)
     
     elif test_type == "📚 Topic-Specific Test":
@@ -77,13 +91,20 @@ def _show_test_setup(test_gen, progress_tracker):
         available_topics = test_gen.get_available_topics()
         selected_topic = st.selectbox("Choose topic:", available_topics)
         
-        question_count = test_gen.get_topic_question_count(selected_topic)
-        max_questions = min(question_count * 3, 30)  # Allow repetition up to 30 questions
+        # Related topics fill in where the topic's own questions run out
+        max_questions = test_gen.get_topic_test_capacity(selected_topic, 30)
         
-        num_questions = st.slider(
-            f"Number of questions (max {max_questions}):", 
-            5, max_questions, min(10, max_questions)
-        )
+        if max_questions == 0:
+            st.warning(f"No questions available for {selected_topic} yet.")
+            return
+        elif max_questions == 1:
+            num_questions = 1
+            st.write("Number of questions: 1")
+        else:
+            num_questions = st.slider(
+                f"Number of questions (max {max_questions}):", 
+                min(5, max_questions - 1), max_questions, min(10, max_questions)
+            )
         
         time_limit = st.selectbox("Time limit:", ["⏰ 30 minutes", "🚀 20 minutes", "⚡ 15 minutes", "🔄 No limit"])
         
@@ -96,12 +117,17 @@ def _show_test_setup(test_gen, progress_tracker):
             elif "15 minutes" in time_limit:
                 time_minutes = 15
             
-            questions = test_gen.generate_topic_test(selected_topic, num_questions)
+            questions = test_gen.generate_topic_test(selected_topic, num_questions, seed=seed)
             _start_test(questions, time_minutes, f"{selected_topic} Test", progress_tracker)
     
     elif test_type == "⚡ Quick Practice (20 questions)":
         st.info("Quick practice session with mixed topics")
         
+        num_questions = test_gen.get_mock_test_capacity(20)
+        if num_questions < 20:
+            st.warning(f"⚠️ The question bank holds {num_questions} questions, "
+                       f"so this test will have {num_questions} questions instead of 20.")
+        
         time_limit = st.selectbox("Time limit:", ["⏰ 20 minutes", "🚀 15 minutes", "⚡ 10 minutes", "🔄 No limit"])
         
         if st.button("🚀 Start Quick Practice", type="primary", use_container_width=True):
@@ -113,7 +139,7 @@ def _show_test_setup(test_gen, progress_tracker):
             elif "10 minutes" in time_limit:
                 time_minutes = 10
             
-            questions = test_gen.generate_mock_test(20)
+            questions = _preset_paper(test_gen, seed, "generate_mock_test", 20)
             _start_test(questions, time_minutes, "Quick Practice", progress_tracker)
     
     elif test_type == "🎯 Difficulty-Based Test":
@@ -137,7 +163,7 @@ def _show_test_setup(test_gen, progress_tracker):
             elif f"{num_questions//2} minutes" in time_limit:
                 time_minutes = num_questions // 2
             
-            questions = test_gen.generate_difficulty_test(selected_difficulty, num_questions)
+            questions = test_gen.generate_difficulty_test(selected_difficulty, num_questions, seed=seed)
             if questions:
                 _start_test(questions, time_minutes, f"{selected_difficulty} Level Test", progress_tracker)
             else:
@@ -176,7 +202,7 @@ def _show_test_setup(test_gen, progress_tracker):
             elif f"{num_questions//2} minutes" in time_limit:
                 time_minutes = num_questions // 2
             
-            questions = test_gen.generate_framework_test(selected_framework, selected_difficulty, num_questions)
+            questions = test_gen.generate_framework_test(selected_framework, selected_difficulty, num_questions, seed=seed)
             if questions:
                 test_name = f"{selected_framework} - {selected_difficulty}" if selected_difficulty != "All Levels" else selected_framework
                 _start_test(questions, time_minutes, test_name, progress_tracker)
@@ -229,7 +255,8 @@ def _show_test_setup(test_gen, progress_tracker):
             questions = test_gen.generate_phd_test(
                 framework=selected_framework.replace(" Frameworks", ""),
                 difficulty=selected_difficulty,
-                num_questions=num_questions
+                num_questions=num_questions,
+                seed=seed
             )
             
             if questions:
@@ -254,17 +281,26 @@ def _show_test_setup(test_gen, progress_tracker):
         }
         
         selected_length = st.selectbox("Choose certification level:", list(test_length_options.keys()))
-        num_questions = test_length_options[selected_length]
+        requested_questions = test_length_options[selected_length]
+        
+        # Show the distribution the test will actually have
+        distribution = test_gen.get_certification_distribution(selected_framework, requested_questions)
+        num_questions = sum(distribution.values())
+        if num_questions < requested_questions:
+            st.warning(f"⚠️ The question bank holds {num_questions} suitable questions for {selected_framework}, "
+                       f"so this test will have {num_questions} questions instead of {requested_questions}.")
+        
+        def share(count):
+            return f"{count / num_questions * 100:.0f}%" if num_questions else "0%"
         
-        # Show question distribution
         with st.expander("📊 Question Distribution"):
             st.markdown(f"""
             **Total Questions: {num_questions}**
-            - Normal: {int(num_questions * 0.20)} questions (20%) - Foundational concepts
-            - Intermediate: {int(num_questions * 0.25)} questions (25%) - Applied knowledge  
-            - Advanced: {int(num_questions * 0.25)} questions (25%) - Complex scenarios
-            - PhD: {int(num_questions * 0.20)} questions (20%) - Theoretical depth
-            - God Level: {int(num_questions * 0.10)} questions (10%) - Research-level mastery
+            - Normal: {distribution['Normal']} questions ({share(distribution['Normal'])}) - Foundational concepts
+            - Intermediate: {distribution['Intermediate']} questions ({share(distribution['Intermediate'])}) - Applied knowledge  
+            - Advanced: {distribution['Advanced']} questions ({share(distribution['Advanced'])}) - Complex scenarios
+            - PhD: {distribution['PhD']} questions ({share(distribution['PhD'])}) - Theoretical depth
+            - God Level: {distribution['God Level']} questions ({share(distribution['God Level'])}) - Research-level mastery
             """)
         
         # Time limit based on question count
@@ -284,10 +320,10 @@ def _show_test_setup(test_gen, progress_tracker):
                 time_minutes = num_questions
             
             # Generate comprehensive certification test
-            questions = test_gen.generate_comprehensive_certification_test(selected_framework, num_questions)
+            questions = _preset_paper(test_gen, seed, "generate_comprehensive_certification_test", selected_framework, requested_questions)
             
             if questions:
-                test_name = f"{selected_framework} Certification ({num_questions}Q)"
+                test_name = f"{selected_framework} Certification ({len(questions)}Q)"
                 _start_test(questions, time_minutes, test_name, progress_tracker)
             else:
                 st.error("Could not generate certification test. Please ensure all content is properly loaded.")
@@ -320,14 +356,24 @@ def _show_test_setup(test_gen, progress_tracker):
                 elif f"{total_questions//2} minutes" in time_limit:
                     time_minutes = total_questions // 2
                 
-                questions = test_gen.generate_mock_test(total_questions, custom_distribution)
+                questions = test_gen.generate_mock_test(total_questions, custom_distribution, seed=seed)
                 _start_test(questions, time_minutes, "Custom Test", progress_tracker)
         else:
             st.warning("Please select at least one question for each topic you want to include.")
 
+def _preset_paper(test_gen, seed, method, *args):
+    """A ready paper from the warm pool, or method(*args) generated now for a seed, seen questions or an empty pool"""
+    questions = None
+    if seed is None and not test_gen.shuffle_options and not len(test_gen.seen):
+        questions = shared_paper_pool().take(method, *args)
+    if questions is None:
+        questions = getattr(test_gen, method)(*args, seed=seed)
+    return questions
+
 def _start_test(questions, time_limit_minutes, test_type, progress_tracker):
     """Start a new test session"""
     session_id = progress_tracker.start_session()
+    get_seen_questions().mark(question['id'] for question in questions)
     
     st.session_state.test_session.update({
         'active': True,
@@ -539,6 +585,10 @@ def _submit_test(progress_tracker):
         minutes = int(elapsed.total_seconds() / 60)
         st.metric("Time Taken", f"{minutes} minutes")
     
+    seed = getattr(questions, 'seed', None)
+    if seed is not None:
+        st.caption(f"Paper seed: {seed} (start the same test with this seed to retake this paper)")
+    
     # Topic breakdown
     st.subheader("📊 Performance by Topic")
     for topic, perf in topic_performance.items():
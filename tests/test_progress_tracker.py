@@ -0,0 +1,46 @@
+import multiprocessing
+import os
+
+import pytest
+
+from utils.progress_tracker import ProgressTracker
+
+PROCESSES = 4
+EVENTS = 30
+
+
+def _study(data_file: str):
+    tracker = ProgressTracker(data_file, flush_every=3, flush_interval=0.2)
+    tracker.store.compact_bytes = 3000
+    session_id = tracker.start_session()
+    for i in range(EVENTS):
+        tracker.record_flashcard_study(session_id, f"card{i}", True)
+        tracker.record_test_result(session_id, "Topic", 50, 4, 2)
+    tracker.end_session(session_id)
+    tracker.close()
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+@pytest.mark.parametrize("run", range(5))
+def test_processes_starting_on_a_fresh_file(tmp_path, run):
+    data_file = os.path.join(tmp_path, "study_progress.json")
+    with open(data_file, "w") as f:
+        f.write("{}")
+
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_study, args=(data_file,)) for _ in range(PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert [process.exitcode for process in processes] == [0] * PROCESSES
+
+    tracker = ProgressTracker(data_file)
+    try:
+        stats = tracker.get_overall_stats()
+        assert stats["total_sessions"] == PROCESSES
+        assert stats["total_tests_taken"] == PROCESSES * EVENTS
+        assert stats["total_flashcards_studied"] == PROCESSES * EVENTS
+        assert tracker.verify_totals()
+    finally:
+        tracker.close()
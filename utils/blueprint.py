@@ -0,0 +1,291 @@
+"""
+Exact-quota blueprints for stratified tests
+
+A Blueprint asks for a number of questions with target shares per topic,
+difficulty and framework. allocate() turns it into whole question counts per
+stratum, a (source, topic, difficulty, framework) cell of the question
+index:
+
+1. Each constrained dimension gets exact integer quotas by largest
+   remainder, never above what its values can supply; the share of a value
+   that runs short passes to the others.
+2. Fractional cell counts are fitted to all quotas at once by iterative
+   proportional fitting, capped at each cell's size.
+3. The cells are rounded by largest remainder to exactly the total, and a
+   repair pass moves questions along augmenting paths between cells until
+   every marginal meets its quota or no path is left. With up to two
+   constrained dimensions this reaches the quotas whenever the cells can
+   hold them at all; a marginal that still misses its quota is logged.
+
+The work depends on the number of strata, not on the number of questions,
+and the counts always add up to the requested total unless the eligible
+strata hold fewer questions than that.
+"""
+import logging
+import random
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Mapping, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Stratum fields constrained by a blueprint, by position in the stratum key
+TOPIC, DIFFICULTY, FRAMEWORK = 1, 2, 3
+
+FIT_ROUNDS = 50
+FIT_TOLERANCE = 0.01
+# Weight of questions outside the preferred ones when fitting
+PREFERENCE_FLOOR = 0.01
+
+Stratum = Tuple[str, str, str, Optional[str]]
+
+
+@dataclass(frozen=True)
+class Blueprint:
+    """Requested size and target shares of a test
+
+    Shares are relative weights and only the listed values are eligible; a
+    dimension left as None is not constrained. Weights that add up to total
+    are exact counts.
+    """
+    total: int
+    topics: Optional[Mapping[str, float]] = None
+    difficulties: Optional[Mapping[str, float]] = None
+    frameworks: Optional[Mapping[str, float]] = None
+    # Question sources to draw from; None allows all
+    sources: Optional[Tuple[str, ...]] = None
+
+    def constraints(self) -> List[Tuple[int, Mapping[str, float]]]:
+        """(stratum field, weights) of the constrained dimensions"""
+        return [(field, weights) for field, weights in
+                ((TOPIC, self.topics), (DIFFICULTY, self.difficulties), (FRAMEWORK, self.frameworks))
+                if weights is not None]
+
+    def allows(self, stratum: Stratum) -> bool:
+        if self.sources is not None and stratum[0] not in self.sources:
+            return False
+        return all(weights.get(stratum[field], 0) > 0 for field, weights in self.constraints())
+
+
+def apportion(weights: Mapping[Hashable, float], total: int,
+              capacity: Optional[Mapping[Hashable, int]] = None) -> Dict[Hashable, int]:
+    """Split total into whole numbers proportional to weights by largest remainder
+
+    No value gets more than its capacity; shares above it pass to the other
+    values in proportion to their weights. The result adds up to total unless
+    the values with a positive weight cannot hold that many.
+    """
+    allocation = {key: 0 for key in weights}
+    caps = {key: total if capacity is None else capacity.get(key, 0)
+            for key, weight in weights.items() if weight > 0}
+    open_keys = [key for key, cap in caps.items() if cap > 0]
+    remaining = min(total, sum(caps[key] for key in open_keys))
+
+    # Fill values whose proportional share exceeds their capacity first
+    while open_keys and remaining > 0:
+        weight_sum = sum(weights[key] for key in open_keys)
+        capped = [key for key in open_keys if remaining * weights[key] / weight_sum >= caps[key]]
+        if not capped:
+            break
+        for key in capped:
+            allocation[key] = caps[key]
+            remaining -= caps[key]
+        open_keys = [key for key in open_keys if key not in capped]
+
+    if open_keys and remaining > 0:
+        weight_sum = sum(weights[key] for key in open_keys)
+        exact = {key: remaining * weights[key] / weight_sum for key in open_keys}
+        for key in open_keys:
+            allocation[key] = int(exact[key])
+        leftover = remaining - sum(allocation[key] for key in open_keys)
+        order = sorted(range(len(open_keys)),
+                       key=lambda i: (-(exact[open_keys[i]] - allocation[open_keys[i]]), -weights[open_keys[i]], i))
+        for i in order[:leftover]:
+            allocation[open_keys[i]] += 1
+    return allocation
+
+
+def allocate(blueprint: Blueprint, strata: Mapping[Stratum, int],
+             preferred: Optional[Mapping[Stratum, int]] = None) -> Dict[Stratum, int]:
+    """Questions to draw from each stratum, given how many each one holds
+
+    preferred optionally gives how many questions of each stratum should be
+    favoured, such as the ones a user has not seen. It steers the counts
+    within the quotas but never changes the quotas.
+    """
+    cells = {stratum: size for stratum, size in strata.items() if size > 0 and blueprint.allows(stratum)}
+    total = min(blueprint.total, sum(cells.values()))
+    if total <= 0:
+        return {}
+
+    quotas = []
+    for field, weights in blueprint.constraints():
+        supply = defaultdict(int)
+        for stratum, size in cells.items():
+            supply[stratum[field]] += size
+        quotas.append((field, apportion(weights, total, supply)))
+
+    fitted = _fit(cells, quotas, total, preferred)
+    counts = apportion(fitted, total, cells)
+    shortfall = total - sum(counts.values())
+    if shortfall > 0:
+        # Cells the fit left empty take what the fitted ones cannot hold
+        spare = {stratum: size - counts.get(stratum, 0) for stratum, size in cells.items()}
+        for stratum, extra in apportion(spare, shortfall, spare).items():
+            counts[stratum] = counts.get(stratum, 0) + extra
+
+    _repair(counts, cells, quotas)
+    for field, quota in quotas:
+        missed = {value: (actual, quota[value]) for value, actual in marginal(counts, field).items()
+                  if actual != quota.get(value, 0)}
+        if missed:
+            logger.warning("Blueprint quotas of field %d cannot all be met by the strata (actual, quota): %s",
+                           field, missed)
+    return {stratum: count for stratum, count in counts.items() if count > 0}
+
+
+def marginal(counts: Mapping[Stratum, int], field: int) -> Dict[str, int]:
+    """Total count per value of a stratum field"""
+    totals = defaultdict(int)
+    for stratum, count in counts.items():
+        totals[stratum[field]] += count
+    return dict(totals)
+
+
+def sample_strata(counts: Mapping[Stratum, int], strata: Mapping[Stratum, Sequence[int]],
+                  rng: random.Random = random, taken: Optional[Set[int]] = None, seen=None) -> List[int]:
+    """Draw the allocated number of positions from every stratum
+
+    Positions in taken are skipped and the drawn ones are added to it; with
+    seen, unseen questions come first within each stratum.
+    """
+    taken = set() if taken is None else taken
+    positions = []
+    for stratum, count in counts.items():
+        positions.extend(draw(strata[stratum], count, taken, rng, seen))
+    return positions
+
+
+def draw(candidates: Sequence[int], count: int, taken: Set[int],
+         rng: random.Random = random, seen=None) -> List[int]:
+    """Up to count candidates that are not in taken, unseen ones first, added to taken"""
+    if count <= 0:
+        return []
+    if taken or seen is not None:
+        free = [position for position in candidates if position not in taken] if taken else candidates
+        unseen, seen_positions = seen.split(free) if seen is not None else (free, [])
+        picked = rng.sample(unseen, min(count, len(unseen)))
+        if len(picked) < count:
+            picked += rng.sample(seen_positions, min(count - len(picked), len(seen_positions)))
+    else:
+        picked = rng.sample(candidates, min(count, len(candidates)))
+    taken.update(picked)
+    return picked
+
+
+def _fit(cells: Mapping[Stratum, int], quotas, total: int,
+         preferred: Optional[Mapping[Stratum, int]] = None) -> Dict[Stratum, float]:
+    """Fractional cell counts matching every marginal quota, capped at the cell sizes"""
+    if preferred is None:
+        seed = dict(cells)
+    else:
+        # Other questions keep a small weight so the fit can still reach every quota
+        seed = {stratum: max(0, preferred.get(stratum, 0)) + PREFERENCE_FLOOR * size for stratum, size in cells.items()}
+    scale = total / sum(seed.values())
+    fitted = {stratum: min(cells[stratum], weight * scale) for stratum, weight in seed.items()}
+
+    for _ in range(FIT_ROUNDS):
+        for field, quota in quotas:
+            sums = defaultdict(float)
+            for stratum, value in fitted.items():
+                sums[stratum[field]] += value
+            for stratum, value in fitted.items():
+                if sums[stratum[field]] > 0:
+                    fitted[stratum] = min(cells[stratum], value * quota[stratum[field]] / sums[stratum[field]])
+
+        converged = True
+        for field, quota in quotas:
+            sums = defaultdict(float)
+            for stratum, value in fitted.items():
+                sums[stratum[field]] += value
+            if any(abs(sums[value] - target) > FIT_TOLERANCE for value, target in quota.items() if target):
+                converged = False
+                break
+        if converged:
+            break
+    return fitted
+
+
+def _repair(counts: Dict[Stratum, int], cells: Mapping[Stratum, int], quotas):
+    """Move questions between cells until every marginal meets its quota, where the cells allow it
+
+    Each field is fixed in turn along augmenting paths over its values: a
+    path from a value above its quota to one below it moves one question per
+    step between two cells that agree on every other constrained field, so
+    the other marginals stay put and every path lowers the deviation of the
+    field by two. The repair ends once no field has a path left.
+    """
+    fields = [field for field, _ in quotas]
+    by_projection = defaultdict(list)
+    for stratum in cells:
+        by_projection[tuple(stratum[field] for field in fields)].append(stratum)
+
+    # Moves on one field can open paths on another, so repeat until none is left
+    moved = True
+    while moved:
+        moved = False
+        for i, (field, quota) in enumerate(quotas):
+            while True:
+                path = _augmenting_path(counts, cells, quota, i, fields, by_projection)
+                if path is None:
+                    break
+                for source, target in path:
+                    counts[source] -= 1
+                    counts[target] = counts.get(target, 0) + 1
+                moved = True
+
+
+def _augmenting_path(counts: Mapping[Stratum, int], cells: Mapping[Stratum, int], quota: Mapping[str, int],
+                     i: int, fields: List[int], by_projection) -> Optional[List[Tuple[Stratum, Stratum]]]:
+    """(source, target) moves taking one question from a value over its quota to one under it, or None"""
+    field = fields[i]
+    actual = defaultdict(int)
+    by_value = defaultdict(list)
+    for stratum, count in counts.items():
+        actual[stratum[field]] += count
+        if count > 0:
+            by_value[stratum[field]].append(stratum)
+    under = {value for value, target in quota.items() if actual[value] < target}
+    frontier = [value for value, target in quota.items() if actual[value] > target]
+    if not under or not frontier:
+        return None
+
+    # Breadth-first over values; parent[value] is the move that reached it
+    parent = {value: None for value in frontier}
+    while frontier:
+        next_frontier = []
+        for value in frontier:
+            for source in by_value[value]:
+                projection = [source[other] for other in fields]
+                for other_value in quota:
+                    if other_value in parent:
+                        continue
+                    projection[i] = other_value
+                    for target in by_projection.get(tuple(projection), ()):
+                        if cells[target] > counts.get(target, 0):
+                            parent[other_value] = (source, target)
+                            if other_value in under:
+                                return _path_to(parent, other_value, field)
+                            next_frontier.append(other_value)
+                            break
+        frontier = next_frontier
+    return None
+
+
+def _path_to(parent, value: str, field: int) -> List[Tuple[Stratum, Stratum]]:
+    path = []
+    while parent[value] is not None:
+        source, target = parent[value]
+        path.append((source, target))
+        value = source[field]
+    return path[::-1]
@@ -0,0 +1,53 @@
+"""
+Process-wide cache of generated papers
+
+TestGenerator stores every paper it generates as the bank ids of its
+questions in order, with their option permutations, keyed by the generator
+configuration and the seed that produced it. Asking for the same
+configuration and seed again, from any browser session, re-serves the
+stored paper without sampling, and the stored ids are what a paper can be
+audited against.
+"""
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Hashable, Optional, Tuple
+
+MAX_PAPERS = 1024
+
+# (question ids, option permutation per question or None)
+PaperRecord = Tuple[Tuple[int, ...], Optional[Tuple[Optional[Tuple[int, ...]], ...]]]
+
+
+class PaperCache:
+    """Generated papers keyed by (configuration, seed), least recently used first"""
+
+    def __init__(self, max_papers: int = MAX_PAPERS):
+        self.max_papers = max_papers
+        self._papers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._papers)
+
+    def get(self, key: Hashable) -> Optional[PaperRecord]:
+        """The stored paper for key, or None"""
+        with self._lock:
+            record = self._papers.get(key)
+            if record is not None:
+                self._papers.move_to_end(key)
+            return record
+
+    def put(self, key: Hashable, record: PaperRecord):
+        """Store a paper, dropping the least recently used ones beyond max_papers"""
+        with self._lock:
+            self._papers[key] = record
+            self._papers.move_to_end(key)
+            while len(self._papers) > self.max_papers:
+                self._papers.popitem(last=False)
+
+
+@lru_cache(maxsize=None)
+def shared_paper_cache() -> PaperCache:
+    """The paper cache shared by every TestGenerator in the process"""
+    return PaperCache()
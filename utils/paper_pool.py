@@ -0,0 +1,109 @@
+"""
+Warm pool of pre-generated papers
+
+Generating a full mock or certification paper takes long enough to be felt
+when "Start" is pressed. PaperPool keeps POOL_DEPTH ready papers for each
+of the common presets (PRESETS) and a daemon thread generates a new one
+whenever a paper is taken, so starting one of those tests is a dequeue.
+
+Pooled papers are shared by every session, so they are generated without a
+user's seen questions and only serve users who have not seen any yet; the
+others get a paper drawn unseen-first on request. Like every generated
+paper they are in the paper cache under their seed, which reproduces them
+exactly.
+"""
+import logging
+import queue
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+from utils.question_bank import FRAMEWORK_TOPICS, Paper
+from utils.test_generator import TestGenerator
+
+logger = logging.getLogger(__name__)
+
+POOL_DEPTH = 3
+
+# Question counts offered for certification tests
+CERTIFICATION_SIZES = (60, 120, 180)
+
+# (TestGenerator method, positional arguments) of the pooled papers
+Preset = Tuple[str, Tuple[Hashable, ...]]
+PRESETS: Tuple[Preset, ...] = (
+    ("generate_mock_test", (120,)),
+    ("generate_mock_test", (20,)),
+) + tuple(("generate_comprehensive_certification_test", (framework, size))
+          for framework in FRAMEWORK_TOPICS for size in CERTIFICATION_SIZES)
+
+
+class PaperPool:
+    """Ready papers per preset, refilled on a dedicated daemon thread"""
+
+    def __init__(self, generator: TestGenerator, presets: Iterable[Preset] = PRESETS,
+                 depth: int = POOL_DEPTH, name: str = "paper-pool"):
+        """
+        Args:
+            generator: Generator used only by the pool thread
+            presets: (method, args) of the papers to keep ready
+            depth: Ready papers per preset
+            name: Thread name
+        """
+        self.generator = generator
+        self.depth = depth
+        self._papers: Dict[Preset, deque] = {preset: deque() for preset in presets}
+        self._lock = threading.Lock()
+        self.queue = queue.Queue()
+        # Fill every preset once before topping any of them up
+        for _ in range(depth):
+            for preset in self._papers:
+                self.queue.put(preset)
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def ready(self, method: str, *args) -> int:
+        """Number of ready papers for a preset"""
+        with self._lock:
+            return len(self._papers.get((method, args), ()))
+
+    def take(self, method: str, *args) -> Optional[Paper]:
+        """A ready paper for generator method(*args), or None if the preset is not pooled or is empty"""
+        preset = (method, args)
+        with self._lock:
+            papers = self._papers.get(preset)
+            if not papers:
+                return None
+            paper = papers.popleft()
+        self.queue.put(preset)
+        return paper
+
+    def close(self):
+        """Stop the refill thread after the paper it is generating"""
+        self.queue.put(None)
+        if threading.current_thread() is not self.thread:
+            self.thread.join()
+
+    def _run(self):
+        while True:
+            preset = self.queue.get()
+            try:
+                if preset is None:
+                    return
+                method, args = preset
+                try:
+                    paper = getattr(self.generator, method)(*args)
+                except Exception:
+                    logger.exception("Could not pre-generate %s%r", method, args)
+                    continue
+                with self._lock:
+                    papers = self._papers[preset]
+                    if len(papers) < self.depth:
+                        papers.append(paper)
+            finally:
+                self.queue.task_done()
+
+
+@lru_cache(maxsize=None)
+def shared_paper_pool() -> PaperPool:
+    """The paper pool shared by every session in the process, started on first use"""
+    return PaperPool(TestGenerator())
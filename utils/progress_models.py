@@ -0,0 +1,411 @@
+"""
+Typed records for progress tracking data
+
+Sessions, test results, flashcard stats and topic performance are held in
+memory as slotted dataclasses. to_dict()/from_dict() are the only place
+they are converted to and from the plain JSON document. Test results are
+stored column-wise in a TestResultColumns table for analytics, and live
+performance points in a fixed-size LivePerformanceRing.
+"""
+import ast
+import copy
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Union
+import numpy as np
+import pandas as pd
+from dateutil import tz
+
+
+@dataclass(slots=True)
+class Session:
+    session_id: str
+    start_time: int
+    end_time: Optional[int] = None
+    flashcards_studied: int = 0
+    tests_taken: int = 0
+    test_scores: List[float] = field(default_factory=list)
+    # Kept as an ordered list without duplicates so it always serializes cleanly
+    topics_covered: List[str] = field(default_factory=list)
+    duration: float = 0
+
+    def add_topic(self, topic: str):
+        if topic not in self.topics_covered:
+            self.topics_covered.append(topic)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "flashcards_studied": self.flashcards_studied,
+            "tests_taken": self.tests_taken,
+            "test_scores": list(self.test_scores),
+            "topics_covered": list(self.topics_covered),
+            "duration": self.duration
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Session":
+        return cls(
+            session_id=data["session_id"],
+            start_time=data["start_time"],
+            end_time=data.get("end_time"),
+            flashcards_studied=data.get("flashcards_studied", 0),
+            tests_taken=data.get("tests_taken", 0),
+            test_scores=list(data.get("test_scores", [])),
+            topics_covered=_topic_list(data.get("topics_covered")),
+            duration=data.get("duration", 0)
+        )
+
+
+@dataclass(slots=True, frozen=True)
+class TestResult:
+    session_id: Optional[str]
+    date: int
+    topic: str
+    score: float
+    total_questions: int
+    correct_answers: int
+    accuracy: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "date": self.date,
+            "topic": self.topic,
+            "score": self.score,
+            "total_questions": self.total_questions,
+            "correct_answers": self.correct_answers,
+            "accuracy": self.accuracy
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TestResult":
+        return cls(
+            session_id=data.get("session_id"),
+            date=data["date"],
+            topic=data["topic"],
+            score=data["score"],
+            total_questions=data["total_questions"],
+            correct_answers=data["correct_answers"],
+            accuracy=data.get("accuracy", 0)
+        )
+
+
+@dataclass(slots=True)
+class FlashcardStat:
+    times_studied: int = 0
+    times_correct: int = 0
+    last_studied: Optional[int] = None
+    difficulty_level: int = 1
+    next_review: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "times_studied": self.times_studied,
+            "times_correct": self.times_correct,
+            "last_studied": self.last_studied,
+            "difficulty_level": self.difficulty_level,
+            "next_review": self.next_review
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FlashcardStat":
+        return cls(
+            times_studied=data["times_studied"],
+            times_correct=data["times_correct"],
+            last_studied=data.get("last_studied"),
+            difficulty_level=data["difficulty_level"],
+            next_review=data.get("next_review")
+        )
+
+
+@dataclass(slots=True)
+class TopicPerformance:
+    total_tests: int = 0
+    total_score: float = 0
+    best_score: float = 0
+    recent_scores: List[float] = field(default_factory=list)
+    improvement_trend: float = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_tests": self.total_tests,
+            "total_score": self.total_score,
+            "best_score": self.best_score,
+            "recent_scores": list(self.recent_scores),
+            "improvement_trend": self.improvement_trend
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TopicPerformance":
+        return cls(
+            total_tests=data["total_tests"],
+            total_score=data["total_score"],
+            best_score=data["best_score"],
+            recent_scores=list(data.get("recent_scores", [])),
+            improvement_trend=data.get("improvement_trend", 0)
+        )
+
+
+class TestResultColumns:
+    """Test results as parallel NumPy columns
+
+    Topics and session ids are dictionary-encoded as integer codes. The
+    columns grow by doubling, so appending is amortized O(1), and columns()
+    returns read-only views of the filled part without copying.
+    """
+
+    _COLUMNS = ("_date", "_score", "_total_questions", "_correct_answers", "_topic", "_session")
+
+    def __init__(self, capacity: int = 64):
+        self._size = 0
+        self._date = np.empty(capacity, dtype=np.int64)
+        self._score = np.empty(capacity, dtype=np.float64)
+        self._total_questions = np.empty(capacity, dtype=np.int32)
+        self._correct_answers = np.empty(capacity, dtype=np.int32)
+        self._topic = np.empty(capacity, dtype=np.int32)
+        # -1 marks a result recorded without a session
+        self._session = np.empty(capacity, dtype=np.int32)
+        self.topics: List[str] = []
+        self.session_ids: List[str] = []
+        self._topic_codes: Dict[str, int] = {}
+        self._session_codes: Dict[str, int] = {}
+
+    @classmethod
+    def from_records(cls, results: Iterable[TestResult]) -> "TestResultColumns":
+        results = list(results)
+        columns = cls(capacity=max(64, len(results)))
+        for result in results:
+            columns.append(result)
+        return columns
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[TestResult]:
+        for index in range(self._size):
+            yield self._record(index)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[TestResult, List[TestResult]]:
+        if isinstance(index, slice):
+            return [self._record(i) for i in range(*index.indices(self._size))]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("test result index out of range")
+        return self._record(index)
+
+    def append(self, result: TestResult):
+        if self._size == len(self._date):
+            self._grow()
+
+        index = self._size
+        self._date[index] = result.date
+        self._score[index] = result.score
+        self._total_questions[index] = result.total_questions
+        self._correct_answers[index] = result.correct_answers
+        self._topic[index] = _encode(result.topic, self.topics, self._topic_codes)
+        self._session[index] = -1 if result.session_id is None else _encode(
+            result.session_id, self.session_ids, self._session_codes
+        )
+        self._size += 1
+
+    def copy(self) -> "TestResultColumns":
+        """Independent copy of the table; appending to either one leaves the other as it was"""
+        table = TestResultColumns(capacity=max(64, self._size))
+        for name in self._COLUMNS:
+            getattr(table, name)[:self._size] = getattr(self, name)[:self._size]
+        table._size = self._size
+        table.topics = list(self.topics)
+        table.session_ids = list(self.session_ids)
+        table._topic_codes = dict(self._topic_codes)
+        table._session_codes = dict(self._session_codes)
+        return table
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Read-only views of the filled columns; topic and session_id hold codes"""
+        views = {
+            "date": self._date[:self._size],
+            "score": self._score[:self._size],
+            "total_questions": self._total_questions[:self._size],
+            "correct_answers": self._correct_answers[:self._size],
+            "topic": self._topic[:self._size],
+            "session_id": self._session[:self._size]
+        }
+        for view in views.values():
+            view.flags.writeable = False
+        return views
+
+    def accuracy(self) -> np.ndarray:
+        """Percentage of correct answers per result, 0 where a test had no questions"""
+        columns = self.columns()
+        total = columns["total_questions"]
+        return np.divide(
+            columns["correct_answers"] * 100.0, total,
+            out=np.zeros(self._size, dtype=np.float64), where=total > 0
+        )
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """DataFrame over the columns; topic and session_id are categoricals
+
+        Numeric columns share memory with the table. date is converted to
+        local naive datetimes for display.
+        """
+        columns = self.columns()
+        dates = pd.to_datetime(columns["date"], unit="ms", utc=True)
+        return pd.DataFrame({
+            "session_id": pd.Categorical.from_codes(columns["session_id"], categories=self.session_ids),
+            "date": dates.tz_convert(tz.tzlocal()).tz_localize(None),
+            "topic": pd.Categorical.from_codes(columns["topic"], categories=self.topics),
+            "score": columns["score"],
+            "total_questions": columns["total_questions"],
+            "correct_answers": columns["correct_answers"],
+            "accuracy": self.accuracy()
+        }, copy=False)
+
+    def _record(self, index: int) -> TestResult:
+        session = int(self._session[index])
+        total_questions = int(self._total_questions[index])
+        correct_answers = int(self._correct_answers[index])
+        return TestResult(
+            session_id=None if session < 0 else self.session_ids[session],
+            date=int(self._date[index]),
+            topic=self.topics[self._topic[index]],
+            score=float(self._score[index]),
+            total_questions=total_questions,
+            correct_answers=correct_answers,
+            accuracy=(correct_answers / total_questions) * 100 if total_questions > 0 else 0
+        )
+
+    def _grow(self):
+        capacity = max(64, len(self._date) * 2)
+        for name in self._COLUMNS:
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, name, grown)
+
+
+class LivePerformanceRing:
+    """The most recent live performance points in preallocated NumPy arrays
+
+    Every point is written twice, at i and i + capacity, so the points in
+    order always form one contiguous window of the arrays and view() never
+    copies.
+    """
+
+    def __init__(self, capacity: int = 50):
+        self.capacity = capacity
+        self._start = 0
+        self._size = 0
+        self._question_num = np.zeros(2 * capacity, dtype=np.int32)
+        self._correct = np.zeros(2 * capacity, dtype=np.bool_)
+        self._accuracy = np.zeros(2 * capacity, dtype=np.float64)
+        self._timestamp = np.zeros(2 * capacity, dtype=np.int64)
+
+    @classmethod
+    def from_dicts(cls, points: Iterable[Dict[str, Any]], capacity: int = 50) -> "LivePerformanceRing":
+        ring = cls(capacity)
+        for point in points:
+            ring.append(point["question_num"], point["correct"], point["accuracy"], point["timestamp"])
+        return ring
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, question_num: int, correct: bool, accuracy: float, timestamp: int):
+        """Add a point, overwriting the oldest one once the ring is full"""
+        if self._size < self.capacity:
+            index = (self._start + self._size) % self.capacity
+            self._size += 1
+        else:
+            index = self._start
+            self._start = (self._start + 1) % self.capacity
+
+        for column, value in ((self._question_num, question_num), (self._correct, correct),
+                              (self._accuracy, accuracy), (self._timestamp, timestamp)):
+            column[index] = value
+            column[index + self.capacity] = value
+
+    def view(self) -> Dict[str, np.ndarray]:
+        """Read-only views of the points, oldest first"""
+        window = slice(self._start, self._start + self._size)
+        views = {
+            "question_num": self._question_num[window],
+            "correct": self._correct[window],
+            "accuracy": self._accuracy[window],
+            "timestamp": self._timestamp[window]
+        }
+        for view in views.values():
+            view.flags.writeable = False
+        return views
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        view = self.view()
+        return [
+            {
+                "question_num": int(view["question_num"][i]),
+                "correct": bool(view["correct"][i]),
+                "accuracy": float(view["accuracy"][i]),
+                "timestamp": int(view["timestamp"][i])
+            }
+            for i in range(self._size)
+        ]
+
+
+# Keys of the progress document that hold records: lists of records, then dicts of records
+RECORD_LISTS = {"sessions": Session, "recent_sessions": Session}
+RECORD_DICTS = {"flashcard_stats": FlashcardStat, "topic_performance": TopicPerformance}
+
+
+def data_from_document(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the in-memory progress data from a stored JSON document"""
+    data = {}
+    for key, value in document.items():
+        if key == "test_results":
+            data[key] = TestResultColumns.from_records(TestResult.from_dict(item) for item in value)
+        elif key == "live_performance":
+            data[key] = LivePerformanceRing.from_dicts(value)
+        elif key in RECORD_LISTS:
+            data[key] = [RECORD_LISTS[key].from_dict(item) for item in value]
+        elif key in RECORD_DICTS:
+            data[key] = {name: RECORD_DICTS[key].from_dict(item) for name, item in value.items()}
+        else:
+            data[key] = value
+    return data
+
+
+def document_from_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Serialize the in-memory progress data to a new JSON-ready document"""
+    document = {}
+    for key, value in data.items():
+        if key == "test_results" or key in RECORD_LISTS:
+            document[key] = [record.to_dict() for record in value]
+        elif key == "live_performance":
+            document[key] = value.to_dicts()
+        elif key in RECORD_DICTS:
+            document[key] = {name: record.to_dict() for name, record in value.items()}
+        else:
+            document[key] = copy.deepcopy(value)
+    return document
+
+
+def _encode(value: str, values: List[str], codes: Dict[str, int]) -> int:
+    code = codes.get(value)
+    if code is None:
+        code = codes[value] = len(values)
+        values.append(value)
+    return code
+
+
+def _topic_list(value: Any) -> List[str]:
+    """Topics as a list; files written while a session was open may hold a set's repr"""
+    if isinstance(value, str):
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return []
+    if isinstance(value, (list, tuple, set)):
+        return list(dict.fromkeys(value))
+    return []
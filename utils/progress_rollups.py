@@ -0,0 +1,106 @@
+"""
+Per-day rollups of old sessions and test results
+
+Raw history older than a retention age is folded into small per-day (and,
+for tests, per-topic) aggregates. The aggregates keep every figure the
+totals and the analytics charts need, so the raw rows can be archived.
+"""
+import gzip
+import json
+from typing import Dict, Iterable, List, Any
+import pandas as pd
+from utils.progress_models import Session, TestResult
+from utils.timestamps import from_epoch_ms
+
+# Score histogram buckets: 0-9, 10-19, ..., 90-100
+HISTOGRAM_BINS = 10
+
+
+def empty_rollups() -> Dict[str, Any]:
+    return {"sessions": {}, "tests": {}}
+
+
+def fold_sessions(rollups: Dict[str, Any], sessions: Iterable[Session]):
+    """Add finished sessions to the per-day session rollups"""
+    for session in sessions:
+        day = _day(session.start_time)
+        agg = rollups["sessions"].setdefault(day, {
+            "count": 0,
+            "duration": 0,
+            "flashcards_studied": 0,
+            "tests_taken": 0
+        })
+        agg["count"] += 1
+        agg["duration"] += session.duration
+        agg["flashcards_studied"] += session.flashcards_studied
+        agg["tests_taken"] += session.tests_taken
+
+
+def fold_test_results(rollups: Dict[str, Any], results: Iterable[TestResult]):
+    """Add test results to the per-day, per-topic test rollups"""
+    for result in results:
+        day = _day(result.date)
+        agg = rollups["tests"].setdefault(day, {}).setdefault(result.topic, {
+            "count": 0,
+            "score_sum": 0,
+            "score_min": result.score,
+            "score_max": result.score,
+            "total_questions": 0,
+            "correct_answers": 0,
+            "histogram": [0] * HISTOGRAM_BINS
+        })
+        agg["count"] += 1
+        agg["score_sum"] += result.score
+        agg["score_min"] = min(agg["score_min"], result.score)
+        agg["score_max"] = max(agg["score_max"], result.score)
+        agg["total_questions"] += result.total_questions
+        agg["correct_answers"] += result.correct_answers
+        agg["histogram"][min(max(int(result.score // 10), 0), HISTOGRAM_BINS - 1)] += 1
+
+
+def rollup_totals(rollups: Dict[str, Any]) -> Dict[str, Any]:
+    """The share of the running totals held in the rollups"""
+    tests = [agg for topics in rollups["tests"].values() for agg in topics.values()]
+    sessions = rollups["sessions"].values()
+
+    return {
+        "total_sessions": sum(agg["count"] for agg in sessions),
+        "total_flashcards_studied": sum(agg["flashcards_studied"] for agg in sessions),
+        "total_tests_taken": sum(agg["count"] for agg in tests),
+        "total_score": sum(agg["score_sum"] for agg in tests),
+        "best_test_score": max((agg["score_max"] for agg in tests), default=0),
+        "total_study_time": sum(agg["duration"] for agg in sessions)
+    }
+
+
+def test_rollups_frame(test_rollups: Dict[str, Dict[str, Any]]) -> pd.DataFrame:
+    """One row per day and topic with the mean score and accuracy"""
+    rows = []
+    for day, topics in test_rollups.items():
+        for topic, agg in topics.items():
+            rows.append({
+                "date": pd.Timestamp(day),
+                "topic": topic,
+                "score": agg["score_sum"] / agg["count"],
+                "accuracy": agg["correct_answers"] / agg["total_questions"] * 100 if agg["total_questions"] > 0 else 0,
+                "count": agg["count"],
+                "score_min": agg["score_min"],
+                "score_max": agg["score_max"]
+            })
+    return pd.DataFrame(rows, columns=["date", "topic", "score", "accuracy", "count", "score_min", "score_max"])
+
+
+def archive_rows(archive_file: str, sessions: List[Dict[str, Any]], test_results: List[Dict[str, Any]]):
+    """Append rolled-up raw rows to a gzip-compressed JSON lines archive"""
+    lines = [json.dumps(dict(session, kind="session")) for session in sessions]
+    lines += [json.dumps(dict(result, kind="test_result")) for result in test_results]
+    if not lines:
+        return
+
+    # Each append adds a gzip member; readers decompress the members as one stream
+    with gzip.open(archive_file, 'at') as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def _day(ms: int) -> str:
+    return from_epoch_ms(ms).date().isoformat()
@@ -0,0 +1,480 @@
+"""
+SQLite storage engine for progress tracking data
+
+Sessions, test results, flashcard stats, topic performance and live
+performance each live in their own indexed table. Only the small per-card and
+per-topic tables are loaded into memory; session and test history stay on disk
+and are reached through indexed queries.
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+from utils.progress_models import Session, TestResult, TestResultColumns, FlashcardStat, TopicPerformance
+from utils.progress_store import SCHEMA_VERSION, FileLock
+from utils.timestamps import to_epoch_ms
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    start_time INTEGER NOT NULL,
+    end_time INTEGER,
+    flashcards_studied INTEGER NOT NULL DEFAULT 0,
+    tests_taken INTEGER NOT NULL DEFAULT 0,
+    test_scores TEXT NOT NULL DEFAULT '[]',
+    topics_covered TEXT NOT NULL DEFAULT '[]',
+    duration REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_start_time ON sessions (start_time);
+CREATE INDEX IF NOT EXISTS idx_sessions_open ON sessions (session_id) WHERE end_time IS NULL;
+
+CREATE TABLE IF NOT EXISTS test_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT,
+    date INTEGER NOT NULL,
+    topic TEXT NOT NULL,
+    score REAL NOT NULL,
+    total_questions INTEGER NOT NULL,
+    correct_answers INTEGER NOT NULL,
+    accuracy REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_test_results_session ON test_results (session_id);
+CREATE INDEX IF NOT EXISTS idx_test_results_topic ON test_results (topic);
+
+CREATE TABLE IF NOT EXISTS flashcard_stats (
+    term TEXT PRIMARY KEY,
+    times_studied INTEGER NOT NULL,
+    times_correct INTEGER NOT NULL,
+    last_studied INTEGER,
+    difficulty_level INTEGER NOT NULL,
+    next_review INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_flashcard_next_review ON flashcard_stats (next_review);
+
+CREATE TABLE IF NOT EXISTS topic_performance (
+    topic TEXT PRIMARY KEY,
+    total_tests INTEGER NOT NULL,
+    total_score REAL NOT NULL,
+    best_score REAL NOT NULL,
+    recent_scores TEXT NOT NULL,
+    improvement_trend REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS live_performance (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    question_num INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    accuracy REAL NOT NULL,
+    timestamp INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Rebuilds the tables of a schema version 1 database, which stored ISO
+# timestamps in TEXT columns, converting every timestamp with epoch_ms()
+UPGRADE_V1 = """
+DROP INDEX IF EXISTS idx_sessions_start_time;
+DROP INDEX IF EXISTS idx_sessions_open;
+DROP INDEX IF EXISTS idx_test_results_session;
+DROP INDEX IF EXISTS idx_test_results_topic;
+DROP INDEX IF EXISTS idx_flashcard_next_review;
+ALTER TABLE sessions RENAME TO sessions_v1;
+ALTER TABLE test_results RENAME TO test_results_v1;
+ALTER TABLE flashcard_stats RENAME TO flashcard_stats_v1;
+ALTER TABLE live_performance RENAME TO live_performance_v1;
+""" + SCHEMA + """
+INSERT INTO sessions
+    SELECT session_id, epoch_ms(start_time), epoch_ms(end_time), flashcards_studied, tests_taken,
+           test_scores, topics_covered, duration
+    FROM sessions_v1;
+INSERT INTO test_results
+    SELECT id, session_id, epoch_ms(date), topic, score, total_questions, correct_answers, accuracy
+    FROM test_results_v1;
+INSERT INTO flashcard_stats
+    SELECT term, times_studied, times_correct, epoch_ms(last_studied), difficulty_level, epoch_ms(next_review)
+    FROM flashcard_stats_v1;
+INSERT INTO live_performance
+    SELECT id, question_num, correct, accuracy, epoch_ms(timestamp)
+    FROM live_performance_v1;
+DROP TABLE sessions_v1;
+DROP TABLE test_results_v1;
+DROP TABLE flashcard_stats_v1;
+DROP TABLE live_performance_v1;
+"""
+
+# Keys of the progress document that are kept in the meta table as JSON
+META_KEYS = [
+    "study_streak", "last_study_date", "framework_performance", "difficulty_performance", "totals", "rollups"
+]
+
+SESSION_UPSERT = "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+TEST_RESULT_INSERT = (
+    "INSERT INTO test_results (session_id, date, topic, score, total_questions, correct_answers, accuracy) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+FLASHCARD_UPSERT = "INSERT OR REPLACE INTO flashcard_stats VALUES (?, ?, ?, ?, ?, ?)"
+TOPIC_UPSERT = "INSERT OR REPLACE INTO topic_performance VALUES (?, ?, ?, ?, ?, ?)"
+LIVE_INSERT = "INSERT INTO live_performance (question_num, correct, accuracy, timestamp) VALUES (?, ?, ?, ?)"
+META_UPSERT = "INSERT OR REPLACE INTO meta VALUES (?, ?)"
+
+
+class SqliteStore:
+    """Progress storage backed by a SQLite database"""
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        # Shared by Streamlit script threads and the background writer
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        # Held across a merge and the write that follows it, which one SQLite transaction cannot span
+        self.file_lock = FileLock(os.path.splitext(db_file)[0] + ".lock")
+        self._data_version = None
+        self._migrate()
+
+    def _migrate(self):
+        """Create the tables, upgrading a database written by an older schema"""
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        has_tables = self.conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'sessions'"
+        ).fetchone()[0]
+
+        if has_tables and version < 2:
+            self.conn.create_function("epoch_ms", 1, to_epoch_ms, deterministic=True)
+            self.conn.executescript("BEGIN;" + UPGRADE_V1 + f"PRAGMA user_version = {SCHEMA_VERSION}; COMMIT;")
+        else:
+            self.conn.executescript(SCHEMA + f"PRAGMA user_version = {SCHEMA_VERSION};")
+
+    def _query(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def is_empty(self) -> bool:
+        """Whether nothing has been stored yet"""
+        row = self._query(
+            "SELECT (SELECT COUNT(*) FROM sessions) + (SELECT COUNT(*) FROM flashcard_stats) "
+            "+ (SELECT COUNT(*) FROM meta)"
+        )[0]
+        return row[0] == 0
+
+    def load(self) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Return the in-memory part of the progress document
+
+        Finished sessions and test history are left in the database; open
+        sessions are loaded so later events can still update them.
+        """
+        with self.file_lock:
+            self._data_version = self._query("PRAGMA data_version")[0][0]
+            return self._load(), []
+
+    def _load(self) -> Dict[str, Any]:
+        data = {
+            "schema_version": SCHEMA_VERSION,
+            "sessions": [
+                _session_from_row(row).to_dict()
+                for row in self._query("SELECT * FROM sessions WHERE end_time IS NULL")
+            ],
+            "test_results": [],
+            "flashcard_stats": {},
+            "topic_performance": {},
+            "live_performance": []
+        }
+
+        for row in self._query("SELECT * FROM flashcard_stats"):
+            data["flashcard_stats"][row["term"]] = {
+                "times_studied": row["times_studied"],
+                "times_correct": row["times_correct"],
+                "last_studied": row["last_studied"],
+                "difficulty_level": row["difficulty_level"],
+                "next_review": row["next_review"]
+            }
+
+        for row in self._query("SELECT * FROM topic_performance"):
+            data["topic_performance"][row["topic"]] = {
+                "total_tests": row["total_tests"],
+                "total_score": row["total_score"],
+                "best_score": row["best_score"],
+                "recent_scores": json.loads(row["recent_scores"]),
+                "improvement_trend": row["improvement_trend"]
+            }
+
+        for row in self._query("SELECT * FROM live_performance ORDER BY id"):
+            data["live_performance"].append({
+                "question_num": row["question_num"],
+                "correct": bool(row["correct"]),
+                "accuracy": row["accuracy"],
+                "timestamp": row["timestamp"]
+            })
+
+        for row in self._query("SELECT key, value FROM meta"):
+            data[row["key"]] = json.loads(row["value"])
+
+        return data
+
+    def prepare(self, events: List[Dict[str, Any]], data: Dict[str, Any],
+                sessions_by_id: Dict[str, Dict[str, Any]]) -> Dict[str, List[tuple]]:
+        """Capture the rows touched by a batch of events as immutable tuples"""
+        session_ids = {event["session_id"] for event in events if event.get("session_id") in sessions_by_id}
+        terms = {event["term"] for event in events if event.get("type") == "flashcard"}
+        topics = {event["topic"] for event in events if event.get("type") == "test_result"}
+
+        rows = {
+            "sessions": [_session_row(sessions_by_id[session_id]) for session_id in session_ids],
+            "flashcard_stats": [_flashcard_row(term, data["flashcard_stats"][term]) for term in terms],
+            "test_results": [],
+            "topic_performance": [_topic_row(topic, data["topic_performance"][topic]) for topic in topics],
+            "live_performance": [],
+            # Running totals change with every event
+            "meta": _meta_rows(data)
+        }
+
+        for event in events:
+            if event.get("type") == "test_result":
+                total = event["total_questions"]
+                rows["test_results"].append(_test_result_row(TestResult(
+                    session_id=event["session_id"],
+                    date=event["ts"],
+                    topic=event["topic"],
+                    score=event["score"],
+                    total_questions=total,
+                    correct_answers=event["correct_answers"],
+                    accuracy=(event["correct_answers"] / total) * 100 if total > 0 else 0
+                )))
+            elif event.get("type") == "live":
+                # Each live event carries every current point; the last one wins
+                rows["live_performance"] = [_live_row(point) for point in event["points"]]
+
+        return rows
+
+    def write(self, rows: Dict[str, List[tuple]]):
+        """Write prepared rows in one transaction"""
+        with self.lock, self.conn:
+            self._write_rows(rows)
+
+    def _write_rows(self, rows: Dict[str, List[tuple]]):
+        self.conn.executemany(SESSION_UPSERT, rows["sessions"])
+        self.conn.executemany(FLASHCARD_UPSERT, rows["flashcard_stats"])
+        self.conn.executemany(TEST_RESULT_INSERT, rows["test_results"])
+        self.conn.executemany(TOPIC_UPSERT, rows["topic_performance"])
+        if rows["live_performance"]:
+            self.conn.execute("DELETE FROM live_performance")
+        self.conn.executemany(LIVE_INSERT, rows["live_performance"])
+        self.conn.executemany(META_UPSERT, rows["meta"])
+
+    def read_changes(self) -> Tuple[bool, List[Dict[str, Any]]]:
+        """Check for commits by other processes; call with file_lock held
+
+        SQLite's data_version changes only when another connection commits,
+        in which case the in-memory rows must be reloaded.
+        """
+        return self._query("PRAGMA data_version")[0][0] != self._data_version, []
+
+    def needs_compaction(self) -> bool:
+        """Rows are updated in place, so there is no log to compact"""
+        return False
+
+    def snapshot(self, data: Dict[str, Any]) -> Dict[str, List[tuple]]:
+        """Capture the current state of every mutable row
+
+        Test results are append-only and already written by write().
+        """
+        return {
+            "sessions": [_session_row(session) for session in data.get("sessions", [])],
+            "flashcard_stats": [_flashcard_row(term, stats) for term, stats in data.get("flashcard_stats", {}).items()],
+            "test_results": [],
+            "topic_performance": [_topic_row(topic, perf) for topic, perf in data.get("topic_performance", {}).items()],
+            "live_performance": [_live_row(point) for point in data["live_performance"].to_dicts()],
+            "meta": _meta_rows(data)
+        }
+
+    def save(self, rows: Dict[str, List[tuple]]):
+        """Write a snapshot taken by snapshot()"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM live_performance")
+            self._write_rows(rows)
+
+    def import_data(self, data: Dict[str, Any]):
+        """Write a complete progress document, test results included"""
+        rows = self.snapshot(data)
+        rows["test_results"] = [_test_result_row(result) for result in data.get("test_results", [])]
+        self.save(rows)
+
+    def recent_sessions(self, limit: int) -> List[Session]:
+        """The most recently started sessions, newest first"""
+        rows = self._query(
+            "SELECT * FROM sessions ORDER BY start_time DESC LIMIT ?", (limit,)
+        )
+        return [_session_from_row(row) for row in rows]
+
+    def all_sessions(self) -> List[Session]:
+        """Every stored session in start order"""
+        rows = self._query("SELECT * FROM sessions ORDER BY start_time")
+        return [_session_from_row(row) for row in rows]
+
+    def test_results(self) -> TestResultColumns:
+        """Every stored test result in recording order"""
+        rows = self._query(
+            "SELECT session_id, date, topic, score, total_questions, correct_answers, accuracy "
+            "FROM test_results ORDER BY id"
+        )
+        return TestResultColumns.from_records(TestResult(*row) for row in rows)
+
+    def history_before(self, cutoff: int) -> Tuple[List[Session], List[TestResult]]:
+        """Finished sessions started and test results taken before cutoff (epoch ms)"""
+        sessions = self._query(
+            "SELECT * FROM sessions WHERE end_time IS NOT NULL AND start_time < ? ORDER BY start_time", (cutoff,)
+        )
+        results = self._query(
+            "SELECT session_id, date, topic, score, total_questions, correct_answers, accuracy "
+            "FROM test_results WHERE date < ? ORDER BY id", (cutoff,)
+        )
+        return [_session_from_row(row) for row in sessions], [TestResult(*row) for row in results]
+
+    def oldest_history(self) -> Optional[int]:
+        """Start of the oldest finished session or test result (epoch ms), or None if there is none"""
+        return self._query(
+            "SELECT MIN(oldest) FROM (SELECT MIN(start_time) AS oldest FROM sessions WHERE end_time IS NOT NULL "
+            "UNION ALL SELECT MIN(date) FROM test_results)"
+        )[0][0]
+
+    def delete_history_before(self, cutoff: int, rows: Dict[str, List[tuple]]):
+        """Drop the rows returned by history_before() and write a snapshot in the same transaction"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM sessions WHERE end_time IS NOT NULL AND start_time < ?", (cutoff,))
+            self.conn.execute("DELETE FROM test_results WHERE date < ?", (cutoff,))
+            self.conn.execute("DELETE FROM live_performance")
+            self._write_rows(rows)
+
+    def scan_totals(self) -> Dict[str, Any]:
+        """Session and test totals computed from the full tables"""
+        sessions = self._query(
+            "SELECT COUNT(*), COALESCE(SUM(flashcards_studied), 0), COALESCE(SUM(duration), 0) FROM sessions"
+        )[0]
+        tests = self._query(
+            "SELECT COUNT(*), COALESCE(SUM(score), 0), COALESCE(MAX(score), 0) FROM test_results"
+        )[0]
+
+        return {
+            "total_sessions": sessions[0],
+            "total_flashcards_studied": sessions[1],
+            "total_tests_taken": tests[0],
+            "total_score": tests[1],
+            "best_test_score": tests[2],
+            "total_study_time": sessions[2]
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def _session_row(session: Session) -> tuple:
+    return (
+        session.session_id,
+        session.start_time,
+        session.end_time,
+        session.flashcards_studied,
+        session.tests_taken,
+        json.dumps(session.test_scores),
+        json.dumps(session.topics_covered),
+        session.duration
+    )
+
+
+def _test_result_row(result: TestResult) -> tuple:
+    return (
+        result.session_id,
+        result.date,
+        result.topic,
+        result.score,
+        result.total_questions,
+        result.correct_answers,
+        result.accuracy
+    )
+
+
+def _flashcard_row(term: str, stats: FlashcardStat) -> tuple:
+    return (
+        term,
+        stats.times_studied,
+        stats.times_correct,
+        stats.last_studied,
+        stats.difficulty_level,
+        stats.next_review
+    )
+
+
+def _topic_row(topic: str, perf: TopicPerformance) -> tuple:
+    return (
+        topic,
+        perf.total_tests,
+        perf.total_score,
+        perf.best_score,
+        json.dumps(perf.recent_scores),
+        perf.improvement_trend
+    )
+
+
+def _live_row(point: Dict[str, Any]) -> tuple:
+    return (point["question_num"], int(point["correct"]), point["accuracy"], point["timestamp"])
+
+
+def _meta_rows(data: Dict[str, Any]) -> List[tuple]:
+    return [(key, json.dumps(data.get(key))) for key in META_KEYS if key in data]
+
+
+def _session_from_row(row: sqlite3.Row) -> Session:
+    return Session(
+        session_id=row["session_id"],
+        start_time=row["start_time"],
+        end_time=row["end_time"],
+        flashcards_studied=row["flashcards_studied"],
+        tests_taken=row["tests_taken"],
+        test_scores=json.loads(row["test_scores"]),
+        topics_covered=json.loads(row["topics_covered"]),
+        duration=row["duration"]
+    )
+
+
+def migrate_json_to_sqlite(data_file: str, db_file: str) -> Dict[str, int]:
+    """Import a JSON progress file (and its journal) into a SQLite database
+
+    The source files are only read; they are left exactly as they were.
+    Returns the number of rows imported per table.
+    """
+    from utils.progress_tracker import ProgressTracker
+
+    tracker = ProgressTracker(data_file, storage="journal", read_only=True)
+    # Pages the full session and test history into tracker.data
+    tracker.get_all_sessions()
+    data = tracker.data
+    tracker.close()
+    store = SqliteStore(db_file)
+    try:
+        store.import_data(data)
+    finally:
+        store.close()
+
+    return {
+        "sessions": len(data.get("sessions", [])),
+        "test_results": len(data.get("test_results", [])),
+        "flashcard_stats": len(data.get("flashcard_stats", {})),
+        "topic_performance": len(data.get("topic_performance", {})),
+        "live_performance": len(data.get("live_performance", []))
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python -m utils.progress_sqlite <study_progress.json> <study_progress.db>")
+        sys.exit(1)
+
+    counts = migrate_json_to_sqlite(sys.argv[1], sys.argv[2])
+    for table, count in counts.items():
+        print(f"{table}: {count}")
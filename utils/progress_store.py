@@ -0,0 +1,562 @@
+"""
+Persistence backends for progress tracking data
+
+Every store splits a write in two steps: prepare()/snapshot() run while the
+tracker's lock is held and capture an immutable payload, write()/save()
+serialize that payload and touch the disk, and may run after the lock is
+released.
+
+Several processes may share one progress file. The file stores guard their
+writes with an advisory lock and carry a version, and read_changes() tells
+a writer what other processes stored since it last read, so it can merge
+before writing instead of overwriting their changes.
+
+The tracker runs the write step on a BackgroundWriter thread: batches are
+written under the file lock after that merge, and while idle the thread
+picks up what other processes stored.
+"""
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import weakref
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from utils.progress_models import document_from_data
+
+try:
+    import fcntl
+except ImportError:
+    # Without fcntl (Windows) the lock only excludes threads of this process
+    fcntl = None
+
+# Version of the stored progress format; 2 stores timestamps as epoch milliseconds
+SCHEMA_VERSION = 2
+
+# Journal size after which the tracker compacts it into a new snapshot
+COMPACT_JOURNAL_BYTES = 1024 * 1024
+
+# Number of previous snapshots kept next to the data file as <data_file>.1 ... .N
+KEEP_SNAPSHOTS = 3
+
+# Finished sessions kept in the journal snapshot so the dashboard never needs the history file
+RECENT_SESSIONS = 20
+
+
+class FileLock:
+    """Advisory lock on a file next to the progress data, shared by all processes using it
+
+    The lock is re-entrant within a process: threads take turns on an RLock
+    and only the outermost holder takes the lock on the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self) -> "FileLock":
+        self._thread_lock.acquire()
+        try:
+            if self._depth == 0:
+                if self._file is None:
+                    self._file = open(self.path, 'a')
+                if fcntl:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0 and fcntl:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+
+class JsonFileStore:
+    """Legacy storage that rewrites the whole progress file on every change
+
+    The document carries a version that every save increments, mirrored in
+    the lock file so that checking it does not parse the document. A version
+    other than the one last read or written means another process saved,
+    and the document has to be reloaded before it is written again.
+    """
+
+    def __init__(self, data_file: str):
+        self.data_file = data_file
+        self.file_lock = FileLock(os.path.splitext(data_file)[0] + ".lock")
+        self.version = 0
+
+    def load(self) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Return the stored progress document and the events still to replay
+
+        Raises ValueError for a journal snapshot, whose journal and history
+        segments this store cannot read.
+        """
+        with self.file_lock:
+            document = _read_json(self.data_file)
+            if document and ("journal_generation" in document or "history_files" in document
+                             or "history_file" in document):
+                raise ValueError(f"{self.data_file} was written in journal mode; open it with storage='journal'")
+            if document:
+                document.pop("version", None)
+            self.version = self._stored_version()
+        return document, []
+
+    def read_changes(self) -> Tuple[bool, List[Dict[str, Any]]]:
+        """Check for saves by other processes; call with file_lock held
+
+        Returns whether the document must be reloaded, and no events since
+        the document holds no log to replay.
+        """
+        return self._stored_version() != self.version, []
+
+    def _stored_version(self) -> int:
+        try:
+            with open(self.file_lock.path, 'r') as f:
+                return int(f.read())
+        except (IOError, ValueError):
+            # No lock file yet, or a save was interrupted while updating it
+            return (_read_json(self.data_file) or {}).get("version", 0)
+
+    def prepare(self, events: List[Dict[str, Any]], data: Dict[str, Any],
+                sessions_by_id: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Capture a batch of changes as a copy of the full document"""
+        return self.snapshot(data)
+
+    def write(self, document: Dict[str, Any]):
+        """Persist a batch of changes by rewriting the full document once"""
+        self.save(document)
+
+    def snapshot(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Serialize the progress data to a new document that can be written from another thread"""
+        return document_from_data(data)
+
+    def needs_compaction(self) -> bool:
+        """The full document is rewritten on every save, so there is no log to compact"""
+        return False
+
+    def save(self, document: Dict[str, Any]):
+        """Write the full progress document under the next version"""
+        with self.file_lock:
+            self.version += 1
+            # Rewritten in place: replacing the lock file would split the lock
+            with open(self.file_lock.path, 'r+') as f:
+                f.write(str(self.version))
+                f.truncate()
+            _write_json_atomic(self.data_file, dict(document, version=self.version))
+
+
+class JournalStore:
+    """Snapshot file plus an append-only event log
+
+    Each change is appended to the journal as one compact JSON line, so the
+    cost of recording an event does not depend on how much history exists.
+    The in-memory state is rebuilt by replaying the journal over the snapshot.
+
+    Compaction writes a new snapshot and starts an empty journal. Both carry
+    a generation number, so a journal whose events are already part of the
+    snapshot (after a crash between the two steps) is never replayed twice.
+
+    Finished sessions and test results are moved out of the snapshot into
+    append-only history segments. Each compaction writes the rows finished
+    since the previous one to a segment named after its generation, and the
+    snapshot lists every segment in order as "history_files", so the cost of
+    compacting does not grow with the history. Loading the snapshot only
+    parses the hot state: totals, streak, flashcard and topic stats, open
+    sessions and the RECENT_SESSIONS most recent finished ones.
+    load_history() reads the segments when the full history is needed.
+
+    The version a process has read is the generation plus the journal length
+    it has seen. Appends from other processes show up as journal bytes past
+    that length and are read back as events; a new generation means another
+    process compacted, and the snapshot has to be reloaded.
+    """
+
+    def __init__(self, data_file: str, journal_file: Optional[str] = None,
+                 compact_bytes: int = COMPACT_JOURNAL_BYTES, keep_snapshots: int = KEEP_SNAPSHOTS):
+        """
+        Args:
+            data_file: Path of the snapshot file
+            journal_file: Path of the event log, next to data_file by default
+            compact_bytes: Journal size that makes needs_compaction() true
+            keep_snapshots: Number of previous snapshots to keep as backups
+        """
+        self.data_file = data_file
+        self.journal_file = journal_file or os.path.splitext(data_file)[0] + ".journal"
+        self.compact_bytes = compact_bytes
+        self.keep_snapshots = keep_snapshots
+        self.file_lock = FileLock(os.path.splitext(data_file)[0] + ".lock")
+        self.generation = None
+        # Length of the journal read or written so far
+        self.journal_bytes = 0
+        self.history_files = []
+        self.history_oldest = None
+        self._snapshot_stat = None
+
+    def load(self) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Return the snapshot and the journal events recorded after it
+
+        Falls back to the newest readable previous snapshot if the data file
+        is missing or damaged.
+        """
+        with self.file_lock:
+            snapshot = _read_json(self.data_file)
+            for index in range(1, self.keep_snapshots + 1):
+                if snapshot is not None:
+                    break
+                snapshot = _read_json(f"{self.data_file}.{index}")
+
+            self.generation = snapshot.pop("journal_generation", None) if snapshot else None
+            if snapshot and "history_file" in snapshot:
+                # Single cumulative history file of older snapshots
+                legacy = snapshot.pop("history_file")
+                snapshot["history_files"] = [legacy] if legacy else []
+            self.history_files = list(snapshot.get("history_files") or []) if snapshot else []
+            self.history_oldest = snapshot.get("history_oldest") if snapshot else None
+            self._snapshot_stat = _stat_key(self.data_file)
+            journal_generation, events, self.journal_bytes = self._read_journal()
+        if journal_generation != self.generation:
+            # Left over from before the last snapshot, which already contains these events
+            events = []
+        return snapshot, events
+
+    def read_changes(self) -> Tuple[bool, List[Dict[str, Any]]]:
+        """Return what other processes stored since the last load or write; call with file_lock held
+
+        Returns whether the snapshot must be reloaded, and otherwise the
+        events appended to the journal by other processes.
+        """
+        journal_generation, _, _ = self._read_journal(limit=1)
+        journal_bytes = os.path.getsize(self.journal_file) if os.path.exists(self.journal_file) else 0
+        if (_stat_key(self.data_file) != self._snapshot_stat or journal_generation != self.generation
+                or journal_bytes < self.journal_bytes):
+            return True, []
+        if journal_bytes == self.journal_bytes:
+            return False, []
+
+        _, events, self.journal_bytes = self._read_journal(self.journal_bytes)
+        return False, events
+
+    def _read_journal(self, offset: int = 0, limit: Optional[int] = None
+                      ) -> Tuple[Optional[int], List[Dict[str, Any]], int]:
+        """Return the journal's generation, its events from offset on and the offset after the last one read
+
+        limit stops after that many lines, so the header can be read alone.
+        """
+        generation = None
+        events = []
+        if not os.path.exists(self.journal_file):
+            return generation, events, 0
+
+        try:
+            with open(self.journal_file, 'rb') as f:
+                f.seek(offset)
+                for count, line in enumerate(f, 1):
+                    try:
+                        event = json.loads(line) if line.strip() else None
+                    except json.JSONDecodeError:
+                        # A torn trailing line from an interrupted write
+                        break
+                    offset += len(line)
+                    if event is None:
+                        pass
+                    elif event.get("type") == "journal":
+                        generation = event["generation"]
+                    else:
+                        events.append(event)
+                    if count == limit:
+                        break
+        except IOError:
+            pass
+
+        return generation, events, offset
+
+    def prepare(self, events: List[Dict[str, Any]], data: Dict[str, Any],
+                sessions_by_id: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Events are never modified after they are recorded, so no copy is needed"""
+        return list(events)
+
+    def write(self, events: List[Dict[str, Any]]):
+        """Append a batch of events to the journal in one write
+
+        Call with file_lock held after read_changes(), so the journal holds
+        no unread events from other processes.
+        """
+        lines = "".join(json.dumps(event, separators=(',', ':'), default=str) + "\n" for event in events).encode()
+        with self.file_lock:
+            with open(self.journal_file, 'ab') as f:
+                f.write(lines)
+            self.journal_bytes += len(lines)
+
+    def needs_compaction(self) -> bool:
+        """Whether the journal has grown past the compaction threshold"""
+        return self.journal_bytes >= self.compact_bytes
+
+    def snapshot(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Serialize the progress data to a new document that can be written from another thread
+
+        data["history_files"] lists the segments that already hold history;
+        data's finished sessions and test results must be the rows that are
+        not in them yet, and are written to a new segment when the snapshot
+        is saved. Afterwards the store's history_files lists every segment.
+
+        Take the snapshot with file_lock held after read_changes(), so its
+        generation follows the newest one on disk.
+        """
+        generation = (self.generation or 0) + 1
+        document = document_from_data(data)
+        document["journal_generation"] = generation
+        return document
+
+    def load_history(self, history_files: List[str]) -> Optional[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        """Return the finished sessions and test results stored in history segments, in segment order
+
+        Returns None if a segment cannot be read.
+        """
+        sessions, test_results = [], []
+        for history_file in history_files:
+            history = _read_json(os.path.join(os.path.dirname(self.data_file), history_file))
+            if history is None:
+                return None
+            sessions.extend(history.get("sessions", []))
+            test_results.extend(history.get("test_results", []))
+        return sessions, test_results
+
+    def save(self, document: Dict[str, Any]):
+        """Compact: write a fresh snapshot atomically and start an empty journal
+
+        The new history segment is written first, so the current snapshot
+        stays consistent until the new one replaces it. The replaced snapshot
+        is kept as <data_file>.1, older ones shift up to <data_file>.N.
+        """
+        with self.file_lock:
+            self._save(document)
+
+    def _save(self, document: Dict[str, Any]):
+        generation = document.pop("journal_generation")
+        history_files = list(document.get("history_files") or [])
+        recent = document.get("recent_sessions", [])
+        # Epoch ms of the oldest row in the segments; None with segments means unknown,
+        # as in snapshots written before it was recorded
+        oldest = document.get("history_oldest") if history_files else None
+        dated = not history_files or oldest is not None
+
+        sessions, open_sessions = [], []
+        for session in document.get("sessions", []):
+            (open_sessions if session.get("end_time") is None else sessions).append(session)
+        test_results = document.get("test_results", [])
+        if sessions or test_results:
+            history_file = self._history_name(generation)
+            _write_json_atomic(
+                os.path.join(os.path.dirname(self.data_file), history_file),
+                {"sessions": sessions, "test_results": test_results},
+                indent=None
+            )
+            if dated:
+                times = [session["start_time"] for session in sessions] + [result["date"] for result in test_results]
+                oldest = min(times + ([oldest] if oldest is not None else []))
+            history_files.append(history_file)
+            recent = list({session["session_id"]: session for session in recent + sessions}.values())
+
+        document = dict(
+            document,
+            sessions=open_sessions,
+            test_results=[],
+            recent_sessions=sorted(recent, key=lambda session: session["start_time"])[-RECENT_SESSIONS:],
+            history_files=history_files,
+            history_oldest=oldest,
+            journal_generation=generation
+        )
+        self._rotate_snapshots()
+        _write_json_atomic(self.data_file, document)
+        self.generation = generation
+        self._snapshot_stat = _stat_key(self.data_file)
+
+        header = json.dumps({"type": "journal", "generation": generation}) + "\n"
+        _write_text_atomic(self.journal_file, header)
+        self.journal_bytes = len(header.encode())
+        self.history_files = history_files
+        self.history_oldest = oldest
+        self._remove_unused_history()
+
+    def _history_name(self, generation: int) -> str:
+        return f"{os.path.splitext(os.path.basename(self.data_file))[0]}.history.{generation}.json"
+
+    def _remove_unused_history(self):
+        """Delete history segments that neither the snapshot nor a kept backup lists"""
+        directory = os.path.dirname(self.data_file) or "."
+        prefix = os.path.splitext(os.path.basename(self.data_file))[0] + ".history."
+        snapshots = [self.data_file] + [f"{self.data_file}.{index}" for index in range(1, self.keep_snapshots + 1)]
+        in_use = set()
+        for path in snapshots:
+            snapshot = _read_json(path) or {}
+            in_use.update(snapshot.get("history_files") or [])
+            in_use.add(snapshot.get("history_file"))
+
+        for name in os.listdir(directory):
+            if name.startswith(prefix) and name.endswith(".json") and name not in in_use:
+                os.remove(os.path.join(directory, name))
+
+    def _rotate_snapshots(self):
+        if self.keep_snapshots <= 0 or not os.path.exists(self.data_file):
+            return
+
+        for index in range(self.keep_snapshots - 1, 0, -1):
+            older = f"{self.data_file}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.data_file}.{index + 1}")
+
+        # A hard link keeps the current snapshot in place until the new one replaces it
+        backup = f"{self.data_file}.1"
+        if os.path.exists(backup):
+            os.remove(backup)
+        try:
+            os.link(self.data_file, backup)
+        except OSError:
+            shutil.copyfile(self.data_file, backup)
+
+
+class BackgroundWriter:
+    """Runs store writes on a dedicated daemon thread fed by a queue
+
+    Failed jobs are kept and retried before the next job so that no batch is
+    dropped; the error is handed to the owner through take_error().
+    """
+
+    def __init__(self, name: str = "progress-writer", idle_interval: Optional[float] = None,
+                 on_idle: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            name: Thread name
+            idle_interval: Seconds without jobs after which on_idle is called
+            on_idle: Bound method run on the writer thread while the queue is
+                idle; it is held weakly and the thread stops once its owner is gone
+        """
+        self.queue = queue.Queue()
+        self.idle_interval = idle_interval
+        self._on_idle = weakref.WeakMethod(on_idle) if on_idle else None
+        self._failed = []
+        self._error = None
+        self._closed = False
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, func: Callable, *args):
+        """Queue func(*args) to run on the writer thread
+
+        Once the writer is closed the job runs on the caller's thread, so an
+        owner still in use after close() keeps saving.
+        """
+        if self._closed and threading.current_thread() is not self.thread:
+            self.thread.join()
+            self._failed.append((func, args))
+            self._retry_failed()
+            return
+        self.queue.put((func, args))
+
+    def flush(self):
+        """Block until every queued job has been attempted"""
+        if self.thread.is_alive():
+            self.queue.join()
+
+    def close(self):
+        """Write everything still queued and stop the thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self.queue.put(None)
+        if threading.current_thread() is not self.thread:
+            self.thread.join()
+
+    def take_error(self) -> Optional[Exception]:
+        """Return and clear the last write error"""
+        error, self._error = self._error, None
+        return error
+
+    def _run(self):
+        while True:
+            try:
+                job = self.queue.get(timeout=self.idle_interval)
+            except queue.Empty:
+                if not self._idle():
+                    return
+                continue
+
+            try:
+                if job is None:
+                    self._retry_failed()
+                    return
+                self._failed.append(job)
+                self._retry_failed()
+            finally:
+                self.queue.task_done()
+
+    def _retry_failed(self):
+        while self._failed:
+            func, args = self._failed[0]
+            try:
+                func(*args)
+            except Exception as e:
+                self._error = e
+                return
+            self._failed.pop(0)
+
+    def _idle(self) -> bool:
+        """Run the idle callback; returns False once the owner is gone"""
+        self._retry_failed()
+        if self._on_idle is None:
+            return True
+
+        on_idle = self._on_idle()
+        if on_idle is None:
+            self._closed = True
+            return False
+
+        on_idle()
+        return True
+
+
+def _write_json_atomic(path: str, document: Dict[str, Any], indent: Optional[int] = 2):
+    """Write JSON to a temporary file and rename it over path"""
+    _write_text_atomic(path, json.dumps(document, indent=indent, default=str))
+
+
+def _write_text_atomic(path: str, text: str):
+    """Write text to a uniquely named temporary file and rename it over path"""
+    fd, temp_file = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                     dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, path)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+
+def _stat_key(path: str) -> Optional[Tuple[int, int, int]]:
+    """Identity of a file's current contents: replaced or rewritten files get a new key"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError):
+            pass
+    return None
@@ -0,0 +1,69 @@
+"""
+Streamlit adapter for progress tracking
+
+The tracker core is plain Python. This module ties it to the running app:
+it picks the user of the current request, keeps their tracker in the
+process-wide cache, shows save errors in the page and reads the study
+session the UI keeps in st.session_state. The user's seen questions are
+cached the same way for the test generator.
+"""
+from functools import partial
+from typing import Any, Dict, List, Optional
+import streamlit as st
+from utils.progress_tracker import ProgressTracker
+from utils.progress_users import TrackerCache, open_user_seen, open_user_tracker
+from utils.seen_questions import SeenQuestions
+
+# Where the user key comes from, in order of precedence
+USER_QUERY_PARAM = "user"
+USER_HEADERS = ("X-Forwarded-User", "X-User")
+USER_COOKIE = "study_user"
+
+
+def show_save_error(error: Exception):
+    """Error callback that reports failed background writes in the page"""
+    st.error("Could not save progress data")
+
+
+def current_user_key() -> Optional[str]:
+    """User key from the ?user= query parameter, a proxy header or the study_user cookie"""
+    candidates = [st.query_params.get(USER_QUERY_PARAM)]
+    candidates += [st.context.headers.get(name) for name in USER_HEADERS]
+    candidates.append(st.context.cookies.get(USER_COOKIE))
+    for key in candidates:
+        # Only strings count; test harnesses may stand in other objects for the request
+        if isinstance(key, str) and key.strip():
+            return key.strip()
+    return None
+
+
+@st.cache_resource
+def tracker_cache() -> TrackerCache:
+    """The process-wide tracker cache shared by all browser sessions"""
+    return TrackerCache(partial(open_user_tracker, on_error=show_save_error))
+
+
+def get_progress_tracker() -> ProgressTracker:
+    """Tracker of the user running the current script"""
+    return tracker_cache().get(current_user_key())
+
+
+@st.cache_resource
+def seen_cache() -> TrackerCache:
+    """Process-wide cache of every user's seen questions"""
+    return TrackerCache(open_user_seen)
+
+
+def get_seen_questions() -> SeenQuestions:
+    """Questions the user running the current script has been shown"""
+    return seen_cache().get(current_user_key())
+
+
+def current_session_stats(progress_tracker: ProgressTracker) -> Dict[str, Any]:
+    """Real-time statistics of the study session kept in st.session_state"""
+    return progress_tracker.get_current_session_stats(st.session_state.get('current_study_session', {}))
+
+
+def current_session_timeline(progress_tracker: ProgressTracker) -> List[Dict[str, Any]]:
+    """Timeline of the study session kept in st.session_state"""
+    return progress_tracker.get_session_timeline(st.session_state.get('current_study_session', {}))
@@ -1,95 +1,541 @@
 """
 Enhanced progress tracking utilities with real-time monitoring capabilities
+
+The tracker is plain Python and does not depend on Streamlit, so workers,
+migrations and batch jobs can use it directly; utils/progress_streamlit.py
+connects it to the app.
 """
-import json
+import atexit
+import contextlib
+import copy
+import logging
+import math
 import os
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
-import streamlit as st
-import pandas as pd
+import threading
+import time
+import weakref
+from datetime import datetime, date, timedelta
+from typing import Callable, Dict, List, Any, Optional
+import numpy as np
+from utils.progress_store import SCHEMA_VERSION, RECENT_SESSIONS, JsonFileStore, JournalStore, BackgroundWriter
+from utils.progress_sqlite import SqliteStore, migrate_json_to_sqlite
+from utils.progress_models import (
+    Session, TestResult, TestResultColumns, FlashcardStat, TopicPerformance, LivePerformanceRing,
+    data_from_document
+)
+from utils.progress_rollups import (
+    archive_rows, empty_rollups, fold_sessions, fold_test_results, rollup_totals
+)
+from utils.review_queue import DueQueue
+from utils.timestamps import DAY_MS, now_ms, to_epoch_ms, from_epoch_ms
+
+# Trackers with possibly unflushed events, flushed at interpreter exit
+_open_trackers = weakref.WeakSet()
+
+logger = logging.getLogger(__name__)
+
+# Seconds between the writer thread's checks for history to roll up
+ROLLUP_CHECK_SECONDS = 3600
+# Days history may pass rollup_days before it is rolled up automatically, so
+# the history is rolled up, and rewritten, about once a day at most
+ROLLUP_SLACK_DAYS = 1
 
 class ProgressTracker:
-    def __init__(self, data_file: str = "study_progress.json"):
+    def __init__(self, data_file: str = "study_progress.json", storage: str = "journal",
+                 flush_every: int = 20, flush_interval: float = 5.0, rollup_days: Optional[int] = 90,
+                 on_error: Optional[Callable[[Exception], None]] = None, read_only: bool = False):
+        """
+        Args:
+            data_file: Path of the progress file (the snapshot in journal mode)
+            storage: "journal" appends one record per event, "json" rewrites the whole file,
+                "sqlite" keeps history in indexed tables next to data_file
+            flush_every: Number of buffered events that triggers a write
+            flush_interval: Age in seconds of the oldest buffered event that triggers a write
+            rollup_days: Age in days after which history is folded into per-day rollups by
+                the writer thread, in every storage mode; None keeps all raw history
+            on_error: Called with errors from background writes; they are logged by default
+            read_only: Never write the files: recording raises RuntimeError, and files from
+                an older schema are only upgraded in memory
+        """
         self.data_file = data_file
+        self.storage = storage
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.rollup_days = rollup_days
+        self.on_error = on_error
+        self.read_only = read_only
+        self.archive_file = os.path.splitext(data_file)[0] + ".archive.jsonl.gz"
+        self._pending = []
+        self._pending_since = None
+        # Batches handed to the writer and not yet written, by sequence number
+        self._unwritten = {}
+        self._batch_seq = 0
+        # The batch the writer is writing right now
+        self._writing = None
+        self._snapshot_queued = False
+        # Rows a written journal snapshot moved to a history segment, still to be dropped
+        self._release = None
+        self._next_rollup_check = 0
+        # Live points are kept in memory and only recorded at session boundaries
+        self._live_dirty = False
+        # Guards self.data and the buffer against the writer thread's timed flush;
+        # taken before the store's file lock whenever both are held
+        self._lock = threading.RLock()
+        if storage == "sqlite":
+            db_file = os.path.splitext(data_file)[0] + ".db"
+            if not os.path.exists(db_file) and os.path.exists(data_file):
+                migrate_json_to_sqlite(data_file, db_file)
+            self.store = SqliteStore(db_file)
+        elif storage == "journal":
+            self.store = JournalStore(data_file)
+        else:
+            self.store = JsonFileStore(data_file)
         self.data = self._load_data()
+        self._writer = BackgroundWriter(idle_interval=flush_interval, on_idle=self._flush_if_due)
+        _open_trackers.add(self)
+        if self._upgraded and not read_only:
+            self._save_data()
     
     def _load_data(self) -> Dict[str, Any]:
-        """Load progress data from file"""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError):
-                pass
-        
-        # Return default structure
+        """Load progress data from the snapshot and replay journaled events"""
+        snapshot, events = self.store.load()
+        
+        with self._lock:
+            self.data = self._default_data()
+            # Leading sessions and test results of self.data that are stored in its history
+            # segments; None while the segments are not loaded
+            self._history_rows = None
+            # Files from before the current schema are rewritten once after loading
+            self._upgraded = False
+            if snapshot:
+                if snapshot.get("schema_version", 1) < SCHEMA_VERSION:
+                    _upgrade_timestamps(snapshot)
+                    self._upgraded = True
+                self.data.update(data_from_document(snapshot))
+            if not self.data.get("history_files"):
+                self._history_rows = (0, 0)
+            
+            # session_id -> session dict; the first of any legacy duplicates wins
+            self._sessions_by_id = {}
+            for session in self.data["sessions"]:
+                self._sessions_by_id.setdefault(session.session_id, session)
+            
+            self._due_queue = DueQueue()
+            for term, stats in self.data["flashcard_stats"].items():
+                if stats.next_review is not None:
+                    self._due_queue.update(term, stats.next_review, stats.difficulty_level)
+            
+            # Files written before running totals existed get them computed once
+            if "totals" not in self.data:
+                self.data["totals"] = self._scan_totals()
+            
+            for event in events:
+                if isinstance(event.get("ts"), str):
+                    event["ts"] = to_epoch_ms(event["ts"])
+                    self._upgraded = True
+                self._apply(event)
+        
+        return self.data
+    
+    def _default_data(self) -> Dict[str, Any]:
+        """Return the default progress structure"""
         return {
+            "schema_version": SCHEMA_VERSION,
             "sessions": [],
             "flashcard_stats": {},
-            "test_results": [],
+            "test_results": TestResultColumns(),
             "topic_performance": {},
             "study_streak": 0,
             "last_study_date": None,
             "current_session": {},
-            "live_performance": [],
+            "live_performance": LivePerformanceRing(),
             "framework_performance": {},
-            "difficulty_performance": {}
+            "difficulty_performance": {},
+            "rollups": empty_rollups()
         }
     
     def _save_data(self):
-        """Save progress data to file"""
+        """Save the full progress data to file"""
+        with self._lock:
+            self._submit_pending()
+            self._submit_snapshot()
+        self._report_write_error()
+    
+    def _submit_snapshot(self):
+        """Have the writer thread write a snapshot of the current data"""
+        self._check_writable()
+        self._snapshot_queued = True
+        self._writer.submit(self._write_snapshot)
+    
+    def _release_marks(self):
+        """What a journal snapshot taken now moves to history: (newly finished sessions,
+        ids of every finished session, number of test results)"""
+        start = self._history_rows[0] if self._history_rows else 0
+        finished = [session for session in self.data["sessions"][start:] if session.end_time is not None]
+        written = {session.session_id for session in self.data["sessions"][:start]}
+        written.update(session.session_id for session in finished)
+        return finished, written, len(self.data["test_results"])
+    
+    def _release_history(self):
+        """Drop the finished sessions and test results that a written snapshot moved to history segments
+        
+        Call with the tracker lock held. Rows recorded while the snapshot
+        was written stay in memory.
+        """
+        if self._release is None:
+            return
+        (finished, written, results), history_files, history_oldest = self._release
+        self._release = None
+        
+        recent = {session.session_id: session for session in self.data.get("recent_sessions", []) + finished}
+        self.data["recent_sessions"] = sorted(recent.values(), key=lambda x: x.start_time)[-RECENT_SESSIONS:]
+        
+        self.data["sessions"] = [session for session in self.data["sessions"] if session.session_id not in written]
+        self._sessions_by_id = {session.session_id: session for session in self.data["sessions"]}
+        self.data["test_results"] = TestResultColumns.from_records(self.data["test_results"][results:])
+        self.data["history_files"] = history_files
+        self.data["history_oldest"] = history_oldest
+        self._history_rows = None if history_files else (0, 0)
+    
+    def _unsegmented(self) -> Dict[str, Any]:
+        """self.data without the history rows its segments already hold, to take a journal snapshot of"""
+        if not self._history_rows or self._history_rows == (0, 0):
+            return self.data
+        sessions, results = self._history_rows
+        return dict(
+            self.data,
+            sessions=self.data["sessions"][sessions:],
+            test_results=TestResultColumns.from_records(self.data["test_results"][results:])
+        )
+    
+    def _load_history(self):
+        """Read the session and test history that is not held in memory yet"""
+        with self._lock, self.store.file_lock:
+            # Another process may have compacted and added or replaced segments
+            self._catch_up()
+            self._read_history()
+    
+    def _read_history(self):
+        """Page in the history segments as listed in self.data; call with both locks held
+        
+        Does not catch up with other processes, so it is safe while the data
+        is still being loaded.
+        """
+        if self._history_rows is not None:
+            return
+        
+        history = self.store.load_history(self.data["history_files"])
+        if history is None:
+            logger.error("Could not read the progress history %s", self.data["history_files"])
+            return
+        sessions, test_results = history
+        
+        history = [Session.from_dict(session) for session in sessions]
+        for session in history:
+            self._sessions_by_id.setdefault(session.session_id, session)
+        self.data["sessions"] = history + self.data["sessions"]
+        self.data["test_results"] = TestResultColumns.from_records(
+            [TestResult.from_dict(result) for result in test_results] + list(self.data["test_results"])
+        )
+        self._history_rows = (len(history), len(test_results))
+    
+    def _write_snapshot(self):
+        """Writer job: merge other processes' changes and write a snapshot of the result
+        
+        The snapshot is taken with the tracker lock and the store's file lock
+        held, so everything recorded so far is in it and no batch is written a
+        second time. Only the file lock is kept while it is written, so other
+        threads go on recording meanwhile. In journal mode the rows it moved
+        to history are dropped from memory afterwards, by the first thread
+        that takes the locks again.
+        """
+        events = []
+        try:
+            with contextlib.ExitStack() as stack:
+                with self._lock:
+                    stack.enter_context(self.store.file_lock)
+                    self._catch_up()
+                    if self.storage == "journal":
+                        document = self.store.snapshot(self._unsegmented())
+                        marks = self._release_marks()
+                    else:
+                        document = self.store.snapshot(self.data)
+                    if self.storage != "sqlite":
+                        # Test results are the only rows a SQLite snapshot leaves to the batches
+                        events = self._unwritten_events()
+                        self._writing = events
+                        self._unwritten.clear()
+                        self._pending = []
+                        self._pending_since = None
+                self.store.save(document)
+                if self.storage == "journal":
+                    self._release = (marks, list(self.store.history_files), self.store.history_oldest)
+                self._writing = None
+        except Exception:
+            if events:
+                with self._lock:
+                    # Written by the next snapshot or batch; replayed if the data is reloaded first
+                    self._unwritten[0] = events
+                    self._writing = None
+            raise
+        with self._lock:
+            self._release_history()
+        self._snapshot_queued = False
+    
+    def _write_batch(self, seq: int):
+        """Writer job: merge other processes' changes, then write everything recorded so far
+        
+        The payload is prepared from the merged data under the file lock, so
+        stale copies of the data never overwrite other processes' changes.
+        Batches queued behind this one are written along with it.
+        """
+        events = None
+        try:
+            with contextlib.ExitStack() as stack:
+                with self._lock:
+                    if seq not in self._unwritten:
+                        # Written with an earlier batch or a snapshot
+                        return
+                    stack.enter_context(self.store.file_lock)
+                    self._catch_up()
+                    events = [event for key in sorted(self._unwritten) for event in self._unwritten[key]]
+                    events += self._pending
+                    payload = self.store.prepare(events, self.data, self._sessions_by_id)
+                    self._writing = events
+                    self._unwritten.clear()
+                    self._pending = []
+                    self._pending_since = None
+                # Other threads may record events while the batch is written
+                self.store.write(payload)
+        except Exception:
+            if events is not None:
+                with self._lock:
+                    self._unwritten[seq] = events
+            raise
+        finally:
+            self._writing = None
+    
+    def _catch_up(self) -> bool:
+        """Apply what other processes stored since this tracker last read the store
+        
+        Call with the tracker lock and the store's file lock held. Returns
+        True if the data changed.
+        """
+        # A snapshot written since the last call has moved rows to history
+        self._release_history()
+        reload, events = self.store.read_changes()
+        if reload:
+            # Rebuild from the files, then replay what this tracker has not written yet
+            unwritten = self._unwritten_events()
+            live = self.data["live_performance"] if self._live_dirty else None
+            self._load_data()
+            events = unwritten
+            if live is not None:
+                self.data["live_performance"] = live
+        
+        for event in events:
+            if isinstance(event.get("ts"), str):
+                event["ts"] = to_epoch_ms(event["ts"])
+            self._apply(event)
+        return reload or bool(events)
+    
+    def _unwritten_events(self) -> List[Dict[str, Any]]:
+        """Recorded events that may not be in the store yet, oldest first; call with the tracker lock held"""
+        events = list(self._writing or [])
+        for seq in sorted(self._unwritten):
+            events.extend(self._unwritten[seq])
+        return events + self._pending
+    
+    def compact(self):
+        """Write a snapshot of the current data, start an empty journal and wait for both"""
+        self._save_data()
+        self.flush()
+    
+    def _record(self, event: Dict[str, Any]):
+        """Apply an event to the in-memory data and buffer it for writing"""
+        self._check_writable()
+        with self._lock:
+            self._apply(event)
+            
+            self._pending.append(event)
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            
+            if (len(self._pending) >= self.flush_every
+                    or time.monotonic() - self._pending_since >= self.flush_interval):
+                self._submit_pending()
+        self._report_write_error()
+    
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError(f"Progress file {self.data_file} is open read-only")
+    
+    def _submit_pending(self):
+        """Hand buffered events to the writer thread as one batch"""
+        if not self._pending:
+            return
+        
+        self._batch_seq += 1
+        self._unwritten[self._batch_seq] = self._pending
+        self._pending = []
+        self._pending_since = None
+        self._writer.submit(self._write_batch, self._batch_seq)
+        
+        # Keeps replay time on the next load bounded
+        if not self._snapshot_queued and self.store.needs_compaction():
+            self._snapshot_queued = True
+            self._writer.submit(self._compact)
+    
+    def _compact(self):
+        """Writer job: roll up old history if due, then write a snapshot that includes it"""
+        self._roll_up_if_due()
+        self._write_snapshot()
+    
+    def _flush_if_due(self):
+        """Called from the writer thread so idle buffers still respect flush_interval"""
+        with self._lock, self.store.file_lock:
+            # Keeps the data current while other processes study
+            self._catch_up()
+            if self._pending_since is not None and time.monotonic() - self._pending_since >= self.flush_interval:
+                self._submit_pending()
+        if self._roll_up_if_due() and self.storage != "sqlite":
+            self._save_data()
+    
+    def _roll_up_if_due(self) -> bool:
+        """Apply rollup_days if history has passed it; runs on the writer thread
+        
+        Checks at most every ROLLUP_CHECK_SECONDS, from the oldest history row
+        alone, so the history is only read when there is something to roll up.
+        Returns True if rows were rolled up; a SQLite store has then already
+        written them, the other stores still need a snapshot.
+        """
+        if self.rollup_days is None or self.read_only or time.monotonic() < self._next_rollup_check:
+            return False
+        self._next_rollup_check = time.monotonic() + ROLLUP_CHECK_SECONDS
+        cutoff = now_ms() - self.rollup_days * DAY_MS
         try:
-            with open(self.data_file, 'w') as f:
-                json.dump(self.data, f, indent=2, default=str)
-        except IOError:
-            st.error("Could not save progress data")
+            with self._lock:
+                oldest = self._oldest_history()
+                if oldest is None or oldest >= cutoff - ROLLUP_SLACK_DAYS * DAY_MS:
+                    return False
+                return any(self._roll_up(cutoff).values())
+        except Exception:
+            # Rolling up is housekeeping; the raw rows stay and the writes go on
+            logger.exception("Could not roll up progress history")
+            return False
+    
+    def _oldest_history(self) -> Optional[int]:
+        """Epoch ms of the oldest finished session or test result, 0 if unknown, None if there is none"""
+        if self.storage == "sqlite":
+            return self.store.oldest_history()
+        times = [session.start_time for session in self.data["sessions"] if session.end_time is not None]
+        dates = self.data["test_results"].columns()["date"]
+        if len(dates):
+            times.append(int(dates.min()))
+        if self._history_rows is None:
+            # The segments are not in memory; snapshots from before they were dated have no history_oldest
+            if self.data.get("history_oldest") is None:
+                return 0
+            times.append(self.data["history_oldest"])
+        return min(times) if times else None
+    
+    def _report_write_error(self):
+        error = self._writer.take_error()
+        if error is None:
+            return
+        if self.on_error:
+            self.on_error(error)
+        else:
+            logger.error("Could not save progress data: %s", error)
+    
+    def flush(self):
+        """Write all buffered events and wait until they are on disk"""
+        with self._lock:
+            self._submit_pending()
+        self._writer.flush()
+        self._report_write_error()
+    
+    def close(self):
+        """Flush buffered events and stop the writer thread"""
+        with self._lock:
+            self._persist_live()
+            self._submit_pending()
+        self._writer.close()
+        _open_trackers.discard(self)
+    
+    def _apply(self, event: Dict[str, Any]):
+        """Apply a recorded event to the in-memory data"""
+        handlers = {
+            "start_session": self._apply_start_session,
+            "end_session": self._apply_end_session,
+            "flashcard": self._apply_flashcard,
+            "test_result": self._apply_test_result,
+            "live": self._apply_live,
+            "framework": self._apply_framework
+        }
+        handler = handlers.get(event.get("type"))
+        if handler:
+            handler(event)
     
     def start_session(self) -> str:
         """Start a new study session"""
-        session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        session = {
-            "session_id": session_id,
-            "start_time": datetime.now().isoformat(),
-            "end_time": None,
-            "flashcards_studied": 0,
-            "tests_taken": 0,
-            "test_scores": [],
-            "topics_covered": set(),
-            "duration": 0
-        }
+        ts = now_ms()
+        # The id and the start time come from one clock reading, the one end_session compares against
+        now = from_epoch_ms(ts)
+        with self._lock:
+            self._persist_live()
+            session_id = f"session_{now.strftime('%Y%m%d_%H%M%S_%f')}"
+            suffix = 1
+            while session_id in self._sessions_by_id:
+                suffix += 1
+                session_id = f"session_{now.strftime('%Y%m%d_%H%M%S_%f')}_{suffix}"
+            self._record({"type": "start_session", "session_id": session_id, "ts": ts})
+        return session_id
+    
+    def _apply_start_session(self, event: Dict[str, Any]):
+        session = Session(session_id=event["session_id"], start_time=event["ts"])
         
         self.data["sessions"].append(session)
-        return session_id
+        self._sessions_by_id.setdefault(session.session_id, session)
+        self.data["totals"]["total_sessions"] += 1
     
     def end_session(self, session_id: str):
         """End a study session"""
-        for session in self.data["sessions"]:
-            if session["session_id"] == session_id:
-                session["end_time"] = datetime.now().isoformat()
-                start_time = datetime.fromisoformat(session["start_time"])
-                end_time = datetime.fromisoformat(session["end_time"])
-                session["duration"] = (end_time - start_time).total_seconds() / 60  # in minutes
-                session["topics_covered"] = list(session.get("topics_covered", set()))
-                break
-        
-        self._update_study_streak()
-        self._save_data()
+        with self._lock:
+            self._persist_live()
+            self._record({"type": "end_session", "session_id": session_id, "ts": now_ms()})
+            self._submit_pending()
+    
+    def _apply_end_session(self, event: Dict[str, Any]):
+        session = self._sessions_by_id.get(event["session_id"])
+        if session:
+            session.end_time = event["ts"]
+            previous_duration = session.duration
+            session.duration = (session.end_time - session.start_time) / 60000  # in minutes
+            self.data["totals"]["total_study_time"] += session.duration - previous_duration
+        
+        self._update_study_streak(from_epoch_ms(event["ts"]).date())
     
     def refresh_data(self):
         """Refresh and reload data for real-time updates"""
+        self.flush()
         self.data = self._load_data()
         self._save_data()
     
-    def get_current_session_stats(self) -> Dict[str, Any]:
-        """Get real-time current session statistics"""
-        current_session = st.session_state.get('current_study_session', {})
+    def get_current_session_stats(self, current_session: Dict[str, Any],
+                                  now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Get real-time statistics of the study session the UI is tracking
         
+        Args:
+            current_session: The UI's current study session record
+            now: Time the duration is measured to, the current time by default
+        """
         duration = 0
         if 'start_time' in current_session:
             start_time = current_session['start_time']
             if isinstance(start_time, str):
                 start_time = datetime.fromisoformat(start_time)
-            duration = (datetime.now() - start_time).total_seconds() / 60
+            duration = ((now or datetime.now()) - start_time).total_seconds() / 60
         
         total_questions = current_session.get('total_questions', 0)
         correct_answers = current_session.get('correct_answers', 0)
@@ -106,32 +552,40 @@ class ProgressTracker:
             'delta_streak': current_session.get('delta_streak', 0)
         }
     
-    def get_live_session_data(self) -> List[Dict[str, Any]]:
-        """Get live session data for real-time charts"""
-        return self.data.get('live_performance', [])
+    def get_live_session_data(self) -> Dict[str, np.ndarray]:
+        """Get live session data for real-time charts
+        
+        Returns read-only arrays (question_num, correct, accuracy, timestamp)
+        over the last 50 points, oldest first.
+        """
+        return self.data['live_performance'].view()
     
     def update_live_performance(self, question_num: int, correct: bool, accuracy: float):
-        """Update live performance tracking"""
-        if 'live_performance' not in self.data:
-            self.data['live_performance'] = []
-        
-        self.data['live_performance'].append({
-            'question_num': question_num,
-            'correct': correct,
-            'accuracy': accuracy,
-            'timestamp': datetime.now().isoformat()
-        })
-        
-        # Keep only last 50 questions for performance
-        if len(self.data['live_performance']) > 50:
-            self.data['live_performance'] = self.data['live_performance'][-50:]
-        
-        self._save_data()
+        """Update live performance tracking in memory; it is saved at the next session boundary"""
+        with self._lock:
+            self.data['live_performance'].append(question_num, correct, accuracy, now_ms())
+            self._live_dirty = True
+    
+    def _persist_live(self):
+        """Record the live points as one event if they changed since the last one"""
+        if self._live_dirty:
+            self._live_dirty = False
+            self._record({"type": "live", "points": self.data['live_performance'].to_dicts()})
+    
+    def _apply_live(self, event: Dict[str, Any]):
+        if "points" in event:
+            self.data['live_performance'] = LivePerformanceRing.from_dicts(event["points"])
+        else:
+            # One point per event, as journaled before live points were batched
+            self.data['live_performance'].append(
+                event['question_num'], event['correct'], event['accuracy'], event['ts']
+            )
     
     def get_framework_performance(self) -> List[Dict[str, Any]]:
         """Get performance data by framework for real-time analysis"""
         framework_stats = []
-        framework_data = self.data.get('framework_performance', {})
+        with self._lock:
+            framework_data = copy.deepcopy(self.data.get('framework_performance', {}))
         
         for framework, stats in framework_data.items():
             if stats.get('total_questions', 0) > 0:
@@ -147,6 +601,11 @@ class ProgressTracker:
     
     def update_framework_performance(self, framework: str, score: float):
         """Update framework-specific performance"""
+        self._record({"type": "framework", "framework": framework, "score": score})
+    
+    def _apply_framework(self, event: Dict[str, Any]):
+        framework = event['framework']
+        score = event['score']
         if 'framework_performance' not in self.data:
             self.data['framework_performance'] = {}
         
@@ -161,13 +620,12 @@ class ProgressTracker:
         stats['total_questions'] += 1
         stats['total_score'] += score
         stats['best_score'] = max(stats['best_score'], score)
-        
-        self._save_data()
     
     def get_difficulty_performance(self) -> List[Dict[str, Any]]:
         """Get performance data by difficulty level"""
         difficulty_stats = []
-        difficulty_data = self.data.get('difficulty_performance', {})
+        with self._lock:
+            difficulty_data = copy.deepcopy(self.data.get('difficulty_performance', {}))
         
         for difficulty, stats in difficulty_data.items():
             if stats.get('total_questions', 0) > 0:
@@ -184,7 +642,8 @@ class ProgressTracker:
     def get_difficulty_recommendations(self) -> List[Dict[str, str]]:
         """Get personalized difficulty recommendations"""
         recommendations = []
-        difficulty_data = self.data.get('difficulty_performance', {})
+        with self._lock:
+            difficulty_data = copy.deepcopy(self.data.get('difficulty_performance', {}))
         
         for difficulty, stats in difficulty_data.items():
             if stats.get('total_questions', 0) >= 5:
@@ -208,16 +667,20 @@ class ProgressTracker:
         
         return recommendations
     
-    def get_session_timeline(self) -> List[Dict[str, Any]]:
-        """Get timeline data for current session"""
+    def get_session_timeline(self, current_session: Dict[str, Any],
+                             now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Get timeline data for the study session the UI is tracking
+        
+        Activities still running end at now, the current time by default.
+        """
         timeline_data = []
-        current_session = st.session_state.get('current_study_session', {})
+        now = now or datetime.now()
         
         if 'timeline' in current_session:
             for event in current_session['timeline']:
                 timeline_data.append({
                     'start_time': event['start_time'],
-                    'end_time': event.get('end_time', datetime.now()),
+                    'end_time': event.get('end_time', now),
                     'activity': event['activity'],
                     'result': event.get('result', 'ongoing'),
                     'details': event.get('details', '')
@@ -227,170 +690,352 @@ class ProgressTracker:
     
     def record_flashcard_study(self, session_id: str, term: str, correct: bool, response_time: Optional[float] = None):
         """Record flashcard study activity"""
+        self._record({
+            "type": "flashcard",
+            "session_id": session_id,
+            "term": term,
+            "correct": correct,
+            "ts": now_ms()
+        })
+    
+    def _apply_flashcard(self, event: Dict[str, Any]):
+        session_id = event["session_id"]
+        term = event["term"]
+        correct = event["correct"]
+        
         # Update session
-        for session in self.data["sessions"]:
-            if session["session_id"] == session_id:
-                session["flashcards_studied"] += 1
-                break
+        session = self._sessions_by_id.get(session_id)
+        if session:
+            session.flashcards_studied += 1
+            self.data["totals"]["total_flashcards_studied"] += 1
         
         # Update flashcard stats
         if term not in self.data["flashcard_stats"]:
-            self.data["flashcard_stats"][term] = {
-                "times_studied": 0,
-                "times_correct": 0,
-                "last_studied": None,
-                "difficulty_level": 1,
-                "next_review": None
-            }
+            self.data["flashcard_stats"][term] = FlashcardStat()
         
         stats = self.data["flashcard_stats"][term]
-        stats["times_studied"] += 1
-        stats["last_studied"] = datetime.now().isoformat()
+        stats.times_studied += 1
+        stats.last_studied = event["ts"]
         
         if correct:
-            stats["times_correct"] += 1
+            stats.times_correct += 1
             # Increase difficulty (space out reviews more)
-            stats["difficulty_level"] = min(5, stats["difficulty_level"] + 1)
+            stats.difficulty_level = min(5, stats.difficulty_level + 1)
         else:
             # Decrease difficulty (review sooner)
-            stats["difficulty_level"] = max(1, stats["difficulty_level"] - 1)
+            stats.difficulty_level = max(1, stats.difficulty_level - 1)
         
         # Calculate next review date based on spaced repetition
-        days_until_review = stats["difficulty_level"] * 2
-        stats["next_review"] = (datetime.now() + timedelta(days=days_until_review)).isoformat()
-        
-        self._save_data()
+        days_until_review = stats.difficulty_level * 2
+        stats.next_review = event["ts"] + days_until_review * DAY_MS
+        self._due_queue.update(term, stats.next_review, stats.difficulty_level)
     
     def record_test_result(self, session_id: str, topic: str, score: float, total_questions: int, correct_answers: int):
         """Record test results"""
-        # Update session
-        for session in self.data["sessions"]:
-            if session["session_id"] == session_id:
-                session["tests_taken"] += 1
-                session["test_scores"].append(score)
-                if isinstance(session.get("topics_covered"), set):
-                    session["topics_covered"].add(topic)
-                else:
-                    topics = set(session.get("topics_covered", []))
-                    topics.add(topic)
-                    session["topics_covered"] = topics
-                break
-        
-        # Record detailed test result
-        test_result = {
+        self._record({
+            "type": "test_result",
             "session_id": session_id,
-            "date": datetime.now().isoformat(),
             "topic": topic,
             "score": score,
             "total_questions": total_questions,
             "correct_answers": correct_answers,
-            "accuracy": (correct_answers / total_questions) * 100 if total_questions > 0 else 0
-        }
+            "ts": now_ms()
+        })
+    
+    def _apply_test_result(self, event: Dict[str, Any]):
+        session_id = event["session_id"]
+        topic = event["topic"]
+        score = event["score"]
         
-        self.data["test_results"].append(test_result)
+        # Update session
+        session = self._sessions_by_id.get(session_id)
+        if session:
+            session.tests_taken += 1
+            session.test_scores.append(score)
+            session.add_topic(topic)
+        
+        # Record detailed test result
+        self.data["test_results"].append(_test_result(event))
+        
+        totals = self.data["totals"]
+        totals["total_tests_taken"] += 1
+        totals["total_score"] += score
+        totals["best_test_score"] = max(totals["best_test_score"], score)
         
         # Update topic performance
         if topic not in self.data["topic_performance"]:
-            self.data["topic_performance"][topic] = {
-                "total_tests": 0,
-                "total_score": 0,
-                "best_score": 0,
-                "recent_scores": [],
-                "improvement_trend": 0
-            }
+            self.data["topic_performance"][topic] = TopicPerformance()
         
         topic_perf = self.data["topic_performance"][topic]
-        topic_perf["total_tests"] += 1
-        topic_perf["total_score"] += score
-        topic_perf["best_score"] = max(topic_perf["best_score"], score)
-        topic_perf["recent_scores"].append(score)
+        topic_perf.total_tests += 1
+        topic_perf.total_score += score
+        topic_perf.best_score = max(topic_perf.best_score, score)
+        topic_perf.recent_scores.append(score)
         
         # Keep only last 10 scores for trend analysis
-        if len(topic_perf["recent_scores"]) > 10:
-            topic_perf["recent_scores"] = topic_perf["recent_scores"][-10:]
+        if len(topic_perf.recent_scores) > 10:
+            topic_perf.recent_scores = topic_perf.recent_scores[-10:]
         
         # Calculate improvement trend
-        if len(topic_perf["recent_scores"]) >= 2:
-            recent = topic_perf["recent_scores"][-3:]  # Last 3 scores
-            older = topic_perf["recent_scores"][:-3] if len(topic_perf["recent_scores"]) > 3 else []
+        if len(topic_perf.recent_scores) >= 2:
+            recent = topic_perf.recent_scores[-3:]  # Last 3 scores
+            older = topic_perf.recent_scores[:-3] if len(topic_perf.recent_scores) > 3 else []
             
             if older:
                 recent_avg = sum(recent) / len(recent)
                 older_avg = sum(older) / len(older)
-                topic_perf["improvement_trend"] = recent_avg - older_avg
-        
-        self._save_data()
+                topic_perf.improvement_trend = recent_avg - older_avg
     
     def get_flashcards_for_review(self, limit: int = 10) -> List[str]:
-        """Get flashcards that need review based on spaced repetition"""
-        now = datetime.now()
-        due_cards = []
-        
-        for term, stats in self.data["flashcard_stats"].items():
-            if stats["next_review"]:
-                next_review = datetime.fromisoformat(stats["next_review"])
-                if next_review <= now:
-                    due_cards.append((term, stats["difficulty_level"]))
-        
-        # Sort by difficulty (easier cards first)
-        due_cards.sort(key=lambda x: x[1])
+        """Get flashcards that need review based on spaced repetition
         
-        return [term for term, _ in due_cards[:limit]]
+        Easier cards come first; within a difficulty level the most overdue
+        cards come first.
+        """
+        with self._lock:
+            return self._due_queue.due(now_ms(), limit)
     
-    def get_topic_performance(self, topic: str) -> Optional[Dict[str, Any]]:
-        """Get performance statistics for a specific topic"""
-        return self.data["topic_performance"].get(topic)
+    def get_due_flashcard_count(self) -> int:
+        """Get the number of flashcards currently due for review"""
+        with self._lock:
+            return self._due_queue.count_due(now_ms())
+    
+    def get_topic_performance(self, topic: str) -> Optional[TopicPerformance]:
+        """Get a copy of the performance statistics for a specific topic"""
+        with self._lock:
+            return copy.deepcopy(self.data["topic_performance"].get(topic))
+    
+    def get_all_topic_performance(self) -> Dict[str, TopicPerformance]:
+        """Get a copy of the performance statistics of every topic"""
+        with self._lock:
+            return copy.deepcopy(self.data["topic_performance"])
+    
+    def get_flashcard_stats(self) -> Dict[str, FlashcardStat]:
+        """Get a copy of the study statistics of every flashcard"""
+        with self._lock:
+            return {term: copy.copy(stats) for term, stats in self.data["flashcard_stats"].items()}
     
     def get_overall_stats(self) -> Dict[str, Any]:
-        """Get overall study statistics"""
-        total_sessions = len(self.data["sessions"])
-        total_flashcards = sum(session.get("flashcards_studied", 0) for session in self.data["sessions"])
-        total_tests = len(self.data["test_results"])
-        
-        if self.data["test_results"]:
-            avg_score = sum(result["score"] for result in self.data["test_results"]) / len(self.data["test_results"])
-            best_score = max(result["score"] for result in self.data["test_results"])
-        else:
-            avg_score = 0
-            best_score = 0
-        
-        total_study_time = sum(session.get("duration", 0) for session in self.data["sessions"])
+        """Get overall study statistics from the running totals"""
+        with self._lock:
+            totals = dict(self.data["totals"])
+            study_streak = self.data["study_streak"]
+            last_study_date = self.data["last_study_date"]
+        total_tests = totals["total_tests_taken"]
         
         return {
-            "total_sessions": total_sessions,
-            "total_flashcards_studied": total_flashcards,
+            "total_sessions": totals["total_sessions"],
+            "total_flashcards_studied": totals["total_flashcards_studied"],
             "total_tests_taken": total_tests,
-            "average_test_score": avg_score,
-            "best_test_score": best_score,
-            "total_study_time": total_study_time,
-            "study_streak": self.data["study_streak"],
-            "last_study_date": self.data["last_study_date"]
+            "average_test_score": totals["total_score"] / total_tests if total_tests > 0 else 0,
+            "best_test_score": totals["best_test_score"],
+            "total_study_time": totals["total_study_time"],
+            "study_streak": study_streak,
+            "last_study_date": last_study_date
         }
     
+    def _scan_totals(self) -> Dict[str, Any]:
+        """Compute the running totals from the full session and test history
+        
+        Reads the history as self.data lists it, without catching up with
+        other processes, since it also runs while the data is being loaded.
+        """
+        if self.storage == "sqlite":
+            totals = self.store.scan_totals()
+        else:
+            with self.store.file_lock:
+                self._read_history()
+            sessions = self.data["sessions"]
+            scores = self.data["test_results"].columns()["score"]
+            
+            totals = {
+                "total_sessions": len(sessions),
+                "total_flashcards_studied": sum(session.flashcards_studied for session in sessions),
+                "total_tests_taken": len(scores),
+                "total_score": float(scores.sum()),
+                "best_test_score": float(scores.max()) if len(scores) else 0,
+                "total_study_time": sum(session.duration for session in sessions)
+            }
+        
+        # History that was rolled up only survives in the rollups
+        rolled = rollup_totals(self.data["rollups"])
+        for key, value in rolled.items():
+            if key == "best_test_score":
+                totals[key] = max(totals[key], value)
+            else:
+                totals[key] += value
+        return totals
+    
+    def roll_up(self, max_age_days: int = 90) -> Dict[str, int]:
+        """Fold finished sessions and test results older than max_age_days into per-day rollups
+        
+        The raw rows are appended to a compressed archive next to the data
+        file and dropped from the history; the totals do not change. Returns
+        the number of rows rolled up per kind.
+        """
+        cutoff = now_ms() - max_age_days * DAY_MS
+        if self.storage == "sqlite":
+            self.flush()
+        
+        with self._lock:
+            rolled = self._roll_up(cutoff)
+            if any(rolled.values()) and self.storage != "sqlite":
+                self._save_data()
+        return rolled
+    
+    def _roll_up(self, cutoff: int) -> Dict[str, int]:
+        """Roll up the history from before cutoff (epoch ms); call with the tracker lock held
+        
+        A SQLite store is written here; the other stores keep the result in
+        memory until the next snapshot.
+        """
+        if self.storage == "sqlite":
+            sessions, test_results = self.store.history_before(cutoff)
+        else:
+            self._load_history()
+            if self._history_rows is None:
+                # The history could not be read; rolling up part of it would count rows twice
+                return {"sessions": 0, "test_results": 0}
+            sessions = [
+                session for session in self.data["sessions"]
+                if session.end_time is not None and session.start_time < cutoff
+            ]
+            test_results = [result for result in self.data["test_results"] if result.date < cutoff]
+        
+        if not sessions and not test_results:
+            if self.storage == "journal":
+                # The whole history is in memory now, so the snapshot can date it
+                self.data["history_oldest"] = self._oldest_history()
+            return {"sessions": 0, "test_results": 0}
+        
+        # Archived before anything is removed, so a failure leaves the raw rows in place
+        archive_rows(
+            self.archive_file,
+            [session.to_dict() for session in sessions],
+            [result.to_dict() for result in test_results]
+        )
+        fold_sessions(self.data["rollups"], sessions)
+        fold_test_results(self.data["rollups"], test_results)
+        
+        rolled_ids = {session.session_id for session in sessions}
+        for session_id in rolled_ids:
+            self._sessions_by_id.pop(session_id, None)
+        self.data["sessions"] = [
+            session for session in self.data["sessions"] if session.session_id not in rolled_ids
+        ]
+        self.data["recent_sessions"] = [
+            session for session in self.data.get("recent_sessions", []) if session.session_id not in rolled_ids
+        ]
+        self.data["test_results"] = TestResultColumns.from_records(
+            result for result in self.data["test_results"] if result.date >= cutoff
+        )
+        if self.data.get("history_files"):
+            # The remaining history is in memory and replaces the segments in the next snapshot
+            self.data["history_files"] = []
+            self.data["history_oldest"] = None
+            self._history_rows = (0, 0)
+        
+        if self.storage == "sqlite":
+            self.store.delete_history_before(cutoff, self.store.snapshot(self.data))
+        return {"sessions": len(sessions), "test_results": len(test_results)}
+    
+    def get_session_rollups(self) -> Dict[str, Dict[str, Any]]:
+        """Per-day aggregates of sessions that were rolled up, keyed by ISO date"""
+        with self._lock:
+            return copy.deepcopy(self.data["rollups"]["sessions"])
+    
+    def get_test_rollups(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Per-day, per-topic aggregates of test results that were rolled up"""
+        with self._lock:
+            return copy.deepcopy(self.data["rollups"]["tests"])
+    
+    def verify_totals(self) -> bool:
+        """Check the running totals against a full history scan
+        
+        Mismatching totals are replaced by the scanned values. Returns True
+        if the totals were already correct.
+        """
+        self.flush()
+        with self._lock:
+            if self.storage != "sqlite":
+                self._load_history()
+            scanned = self._scan_totals()
+            totals = self.data["totals"]
+            matches = all(math.isclose(totals.get(key, 0), value, abs_tol=1e-6) for key, value in scanned.items())
+            if not matches:
+                self.data["totals"] = scanned
+                self._save_data()
+        
+        return matches
+    
     def get_recent_sessions(self, limit: int = 5) -> List[Dict[str, Any]]:
         """Get recent study sessions"""
-        sessions = sorted(self.data["sessions"], key=lambda x: x["start_time"], reverse=True)
+        if self.storage == "sqlite":
+            sessions = self._with_held_sessions(self.store.recent_sessions(limit))
+        else:
+            with self._lock:
+                sessions = self.data["sessions"]
+                if self._history_rows is None:
+                    sessions = self.data.get("recent_sessions", []) + sessions
+                sessions = _copy_open(sessions)
+        sessions = sorted(sessions, key=lambda x: x.start_time, reverse=True)[:limit]
         
         result = []
-        for session in sessions[:limit]:
-            if session.get("end_time"):
+        for session in sessions:
+            if session.end_time:
                 result.append({
-                    "session_id": session["session_id"],
-                    "date": datetime.fromisoformat(session["start_time"]).strftime("%Y-%m-%d %H:%M"),
-                    "duration": round(session.get("duration", 0), 1),
-                    "flashcards_studied": session.get("flashcards_studied", 0),
-                    "test_scores": session.get("test_scores", [])
+                    "session_id": session.session_id,
+                    "date": from_epoch_ms(session.start_time).strftime("%Y-%m-%d %H:%M"),
+                    "duration": round(session.duration, 1),
+                    "flashcards_studied": session.flashcards_studied,
+                    "test_scores": session.test_scores
                 })
         
         return result
     
-    def get_all_sessions(self) -> List[Dict[str, Any]]:
-        """Get all study sessions"""
-        return self.data["sessions"]
+    def get_all_sessions(self) -> List[Session]:
+        """Get a copy of the list of all study sessions"""
+        if self.storage == "sqlite":
+            return sorted(self._with_held_sessions(self.store.all_sessions()), key=lambda x: x.start_time)
+        self._load_history()
+        with self._lock:
+            return _copy_open(self.data["sessions"])
+    
+    def get_test_results(self) -> TestResultColumns:
+        """Get all recorded test results as a columnar table"""
+        if self.storage == "sqlite":
+            with self._lock:
+                unwritten = [_test_result(event) for event in self._unwritten_events()
+                             if event.get("type") == "test_result"]
+            # Read after collecting, so a batch committed in between is found in the table
+            stored = self.store.test_results()
+            if not unwritten:
+                return stored
+            dates = stored.columns()["date"]
+            earliest = min(result.date for result in unwritten)
+            committed = {stored[int(index)] for index in np.flatnonzero(dates >= earliest)}
+            for result in unwritten:
+                if result not in committed:
+                    stored.append(result)
+            return stored
+        self._load_history()
+        with self._lock:
+            return self.data["test_results"].copy()
+    
+    def _with_held_sessions(self, stored: List[Session]) -> List[Session]:
+        """Stored sessions with the ones held in memory in their place
+        
+        In SQLite mode the tracker holds the sessions that were open at load
+        and the ones it started since, with every recorded event applied, so
+        reading them does not wait for the writer thread.
+        """
+        with self._lock:
+            held = {session.session_id: session for session in _copy_open(self.data["sessions"])}
+        sessions = [held.pop(session.session_id, session) for session in stored]
+        return sessions + list(held.values())
     
-    def _update_study_streak(self):
+    def _update_study_streak(self, today: date):
         """Update the study streak counter"""
-        today = datetime.now().date()
         last_date = None
         
         if self.data["last_study_date"]:
@@ -410,3 +1055,48 @@ class ProgressTracker:
             self.data["study_streak"] = 1
         
         self.data["last_study_date"] = today.isoformat()
+
+
+def _copy_open(sessions: List[Session]) -> List[Session]:
+    """A new list of sessions in which the open ones, which events still change, are copies"""
+    return [session if session.end_time is not None else copy.deepcopy(session) for session in sessions]
+
+
+def _test_result(event: Dict[str, Any]) -> TestResult:
+    """The TestResult recorded by a test_result event"""
+    total_questions = event["total_questions"]
+    correct_answers = event["correct_answers"]
+    return TestResult(
+        session_id=event["session_id"],
+        date=event["ts"],
+        topic=event["topic"],
+        score=event["score"],
+        total_questions=total_questions,
+        correct_answers=correct_answers,
+        accuracy=(correct_answers / total_questions) * 100 if total_questions > 0 else 0
+    )
+
+
+def _upgrade_timestamps(data: Dict[str, Any]):
+    """Convert the ISO timestamps of a schema version 1 document to epoch milliseconds"""
+    for session in data.get("sessions", []):
+        session["start_time"] = to_epoch_ms(session["start_time"])
+        session["end_time"] = to_epoch_ms(session.get("end_time"))
+    
+    for stats in data.get("flashcard_stats", {}).values():
+        stats["last_studied"] = to_epoch_ms(stats.get("last_studied"))
+        stats["next_review"] = to_epoch_ms(stats.get("next_review"))
+    
+    for result in data.get("test_results", []):
+        result["date"] = to_epoch_ms(result["date"])
+    
+    for point in data.get("live_performance", []):
+        point["timestamp"] = to_epoch_ms(point["timestamp"])
+    
+    data["schema_version"] = SCHEMA_VERSION
+
+
+@atexit.register
+def _flush_open_trackers():
+    for tracker in list(_open_trackers):
+        tracker.close()
@@ -0,0 +1,161 @@
+"""
+Per-user progress stores
+
+Each user's progress lives in its own directory under USER_DATA_DIR, so users
+never share a file or its lock. Loaded trackers are kept in one process-wide
+LRU shared by every browser session; trackers that go unused for a while are
+flushed and closed, so memory and open files follow the number of active
+users rather than the number of users who ever studied. The questions each
+user has been shown are kept the same way, in a seen-questions file next to
+their progress file.
+
+Which user a request belongs to is decided by the Streamlit adapter in
+utils/progress_streamlit.py.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+from utils.progress_tracker import ProgressTracker
+from utils.seen_questions import SeenQuestions, seen_questions_file
+from utils.study_artifact import load_question_bank
+
+# Progress file used when no user key is given, as before users were partitioned
+SHARED_DATA_FILE = "study_progress.json"
+USER_DATA_DIR = "user_progress"
+
+MAX_TRACKERS = 64
+IDLE_SECONDS = 15 * 60
+
+
+def user_data_file(user_key: Optional[str], base_dir: str = USER_DATA_DIR) -> str:
+    """Path of a user's progress file; without a user key the shared file is used
+
+    The directory name keeps a readable part of the key plus a hash of the
+    whole key, so distinct keys never collide after unsafe characters are
+    replaced.
+    """
+    if not user_key:
+        return SHARED_DATA_FILE
+
+    slug = re.sub(r"[^A-Za-z0-9_-]", "_", user_key)[:40]
+    digest = hashlib.sha256(user_key.encode()).hexdigest()[:12]
+    return os.path.join(base_dir, f"{slug}-{digest}", "study_progress.json")
+
+
+def open_user_tracker(user_key: Optional[str], **options: Any) -> ProgressTracker:
+    """Load the tracker for a user's progress file, creating its directory if needed
+
+    options are passed on to ProgressTracker.
+    """
+    data_file = user_data_file(user_key)
+    if os.path.dirname(data_file):
+        os.makedirs(os.path.dirname(data_file), exist_ok=True)
+    return ProgressTracker(data_file, **options)
+
+
+def open_user_seen(user_key: Optional[str]) -> SeenQuestions:
+    """Load the set of questions a user has been shown, kept next to their progress file"""
+    data_file = user_data_file(user_key)
+    if os.path.dirname(data_file):
+        os.makedirs(os.path.dirname(data_file), exist_ok=True)
+    return SeenQuestions(load_question_bank(), seen_questions_file(data_file))
+
+
+class TrackerCache:
+    """Loaded trackers keyed by user, least recently used first
+
+    get() evicts trackers idle for longer than idle_seconds, and the least
+    recently used ones beyond max_trackers. Evicted trackers are closed, which
+    writes everything they still buffer. Trackers are loaded outside the
+    cache lock, so loading one user never holds up the others.
+    """
+
+    def __init__(self, factory: Callable[[Optional[str]], ProgressTracker] = open_user_tracker,
+                 max_trackers: int = MAX_TRACKERS, idle_seconds: float = IDLE_SECONDS):
+        """
+        Args:
+            factory: Creates the tracker for a user key
+            max_trackers: Number of trackers kept loaded at most
+            idle_seconds: Time without get() after which a tracker is evicted
+        """
+        self.factory = factory
+        self.max_trackers = max_trackers
+        self.idle_seconds = idle_seconds
+        # user key -> (tracker, time of last use)
+        self._trackers = OrderedDict()
+        # user key -> lock held while that user's tracker is being loaded
+        self._loading: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._trackers)
+
+    def get(self, user_key: Optional[str]) -> ProgressTracker:
+        """Return the user's tracker, loading it on first use"""
+        key = user_key or ""
+        with self._lock:
+            evicted = self._take_evicted(time.monotonic())
+            tracker = self._use(key, evicted)
+            if tracker is None:
+                loading = self._loading.setdefault(key, threading.Lock())
+
+        if tracker is None:
+            # Loading can take long, so only other gets of the same user wait for it
+            with loading:
+                with self._lock:
+                    tracker = self._use(key, evicted)
+                if tracker is None:
+                    tracker = self.factory(user_key)
+                    with self._lock:
+                        self._trackers[key] = (tracker, time.monotonic())
+                        self._trim(evicted)
+                        if self._loading.get(key) is loading:
+                            del self._loading[key]
+
+        # Closing waits for the writer, so it happens outside the lock
+        for old in evicted:
+            old.close()
+        return tracker
+
+    def evict_idle(self) -> int:
+        """Close trackers that were not used within idle_seconds; returns how many"""
+        with self._lock:
+            evicted = self._take_evicted(time.monotonic())
+        for tracker in evicted:
+            tracker.close()
+        return len(evicted)
+
+    def close(self):
+        """Close every loaded tracker"""
+        with self._lock:
+            evicted = [tracker for tracker, _ in self._trackers.values()]
+            self._trackers.clear()
+        for tracker in evicted:
+            tracker.close()
+
+    def _use(self, key: str, evicted: List[ProgressTracker]) -> Optional[ProgressTracker]:
+        """The loaded tracker for key marked as just used, or None; call with the lock held"""
+        entry = self._trackers.pop(key, None)
+        if entry is None:
+            return None
+        self._trackers[key] = (entry[0], time.monotonic())
+        self._trim(evicted)
+        return entry[0]
+
+    def _trim(self, evicted: List[ProgressTracker]):
+        while len(self._trackers) > self.max_trackers:
+            evicted.append(self._trackers.popitem(last=False)[1][0])
+
+    def _take_evicted(self, now: float) -> List[ProgressTracker]:
+        evicted = []
+        while self._trackers:
+            key, (tracker, last_used) = next(iter(self._trackers.items()))
+            if now - last_used < self.idle_seconds:
+                break
+            del self._trackers[key]
+            evicted.append(tracker)
+        return evicted
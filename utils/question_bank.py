@@ -0,0 +1,218 @@
+"""
+Normalized question bank
+
+Questions come in three shapes: topic-keyed lists that answer with an option
+index (data/study_data.py), per-framework sections (data/enhanced_study_data.py)
+and PhD questions that answer with an option letter and prefix every option
+with it (data/phd_level_study_data.py). iter_source_questions() converts all
+of them into immutable Question records with a stable content-hash id, an
+integer answer index and interned topic, difficulty and framework names, and
+QuestionBank indexes them for the test generators. The bank is compiled and
+loaded once per process by utils/study_artifact.py.
+"""
+import hashlib
+import re
+import sys
+from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple, Union
+from data.study_data import get_questions_by_topic
+from data.enhanced_study_data import (
+    get_progressive_openai_sdk_questions,
+    get_enhanced_building_agents_questions,
+    get_enhanced_mcp_questions,
+    PHD_QUESTIONS_POOL,
+    HAS_PHD_CONTENT
+)
+from utils.question_index import QuestionIndex
+
+# Where a question came from
+SOURCE_TOPIC = "topic"
+SOURCE_ENHANCED = "enhanced"
+SOURCE_PHD = "phd"
+
+FRAMEWORK_TOPICS = {
+    "Building Effective Agents": ("Agent Architecture", "Design Patterns", "Memory Systems", "Tool Integration", "Retrieval Systems", "Economic Integration"),
+    "Model Context Protocol (MCP)": ("MCP Fundamentals", "Transport Layers", "HTTP Theory", "REST Architecture", "JSON-RPC", "Security", "MCP OpenAI Integration"),
+    "OpenAI Agents SDK": ("OpenAI Agents SDK Fundamentals", "OpenAI Agents Implementation", "OpenAI Tools and Functions", "OpenAI Handoffs and Multi-Agent", "OpenAI Sessions and State", "OpenAI Guardrails and Security", "OpenAI Tracing and Monitoring")
+}
+
+# Framework names used by the source data -> names in FRAMEWORK_TOPICS
+FRAMEWORK_ALIASES = {"MCP": "Model Context Protocol (MCP)"}
+
+DEFAULT_DIFFICULTY = "Normal"
+
+# "B) ..." option prefix of the PhD questions
+_OPTION_LETTER = re.compile(r"[A-Z]\)\s+")
+
+
+@dataclass(frozen=True, slots=True)
+class Question:
+    id: int
+    source: str
+    topic: str
+    difficulty: str
+    framework: Optional[str]
+    question: str
+    options: Tuple[str, ...]
+    correct: int
+    explanation: str
+
+
+@dataclass(frozen=True, slots=True)
+class PaperQuestion(Mapping):
+    """One question of a generated test: a bank question, its number and an optional option order
+
+    Reads like the question dicts the mock test pages use ('question',
+    'options', 'correct', 'topic', ...) without copying anything from the
+    shared bank, and cannot be used to change it.
+    """
+    bank_question: Question
+    number: int
+    # Bank option index shown at each position; None keeps the bank order
+    permutation: Optional[Tuple[int, ...]] = None
+
+    KEYS = ("id", "question_number", "question", "options", "correct", "explanation", "topic", "difficulty", "framework")
+
+    @property
+    def id(self) -> int:
+        return self.bank_question.id
+
+    @property
+    def options(self) -> Tuple[str, ...]:
+        if self.permutation is None:
+            return self.bank_question.options
+        return tuple(self.bank_question.options[i] for i in self.permutation)
+
+    @property
+    def correct(self) -> int:
+        if self.permutation is None:
+            return self.bank_question.correct
+        return self.permutation.index(self.bank_question.correct)
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "question_number":
+            return self.number
+        if key == "options":
+            return self.options
+        if key == "correct":
+            return self.correct
+        if key in self.KEYS:
+            return getattr(self.bank_question, key)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+
+class Paper(list):
+    """A generated test: its PaperQuestions in order, with the configuration and seed that produced it
+
+    Passing the seed back to the same generator method with the same
+    arguments gives the same paper; one drawn unseen-first for a user is
+    given back from the paper cache while it holds the paper.
+    """
+
+    def __init__(self, questions: Iterable[PaperQuestion] = (), config: Optional[Tuple] = None,
+                 seed: Optional[int] = None):
+        super().__init__(questions)
+        self.config = config
+        self.seed = seed
+
+
+def question_id(question: str, options: Iterable[str]) -> int:
+    """Stable 63-bit id derived from the question text and its options"""
+    payload = "\x1f".join([question, *options]).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(payload, digest_size=8).digest(), "big") >> 1
+
+
+def normalize_question(raw: Dict[str, Any], source: str, topic: str,
+                       framework: Optional[str] = None) -> Question:
+    """Convert one source question dict into a Question
+
+    Lettered options lose their "A) " prefix and letter answers become
+    option indexes. Raises ValueError if the answer does not name an option.
+    """
+    options = list(raw["options"])
+    if options and all(_OPTION_LETTER.match(option) for option in options):
+        options = [_OPTION_LETTER.sub("", option, count=1) for option in options]
+
+    correct: Union[int, str] = raw["correct"]
+    if isinstance(correct, str):
+        letter = correct.strip().upper()
+        correct = ord(letter) - ord("A") if len(letter) == 1 else -1
+    if not 0 <= correct < len(options):
+        raise ValueError(f"Answer {raw['correct']!r} is not an option of question: {raw['question'][:60]}")
+
+    framework = raw.get("framework") or framework
+    framework = FRAMEWORK_ALIASES.get(framework, framework)
+    return Question(
+        id=question_id(raw["question"], options),
+        source=sys.intern(source),
+        topic=sys.intern(raw.get("topic") or topic),
+        difficulty=sys.intern(raw.get("difficulty") or DEFAULT_DIFFICULTY),
+        framework=sys.intern(framework) if framework else None,
+        question=raw["question"],
+        options=tuple(options),
+        correct=correct,
+        explanation=raw.get("explanation", ""),
+    )
+
+
+class QuestionBank:
+    """Immutable collection of normalized questions, addressed by position or id
+
+    A question found in several sources is kept once, from the first source.
+    """
+
+    def __init__(self, questions: Iterable[Question]):
+        unique: Dict[int, Question] = {}
+        for question in questions:
+            unique.setdefault(question.id, question)
+        self.questions: Tuple[Question, ...] = tuple(unique.values())
+        self._positions = MappingProxyType({question.id: position for position, question in enumerate(self.questions)})
+        self.index = QuestionIndex(self.questions)
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def __iter__(self) -> Iterator[Question]:
+        return iter(self.questions)
+
+    def __getitem__(self, position: int) -> Question:
+        return self.questions[position]
+
+    def get(self, question_id: int) -> Optional[Question]:
+        """Question with the given id, or None"""
+        position = self._positions.get(question_id)
+        return None if position is None else self.questions[position]
+
+    def position(self, question_id: int) -> int:
+        """Position of the question with the given id; raises KeyError if unknown"""
+        return self._positions[question_id]
+
+
+def iter_source_questions() -> Iterator[Question]:
+    """Normalized questions of every data module, topic pool first"""
+    topic_frameworks = {topic: framework for framework, topics in FRAMEWORK_TOPICS.items() for topic in topics}
+    for topic, questions in get_questions_by_topic().items():
+        for raw in questions:
+            yield normalize_question(raw, SOURCE_TOPIC, topic, topic_frameworks.get(topic))
+
+    for framework, sections in (
+        ("OpenAI Agents SDK", get_progressive_openai_sdk_questions()),
+        ("Building Effective Agents", get_enhanced_building_agents_questions()),
+        ("Model Context Protocol (MCP)", get_enhanced_mcp_questions()),
+    ):
+        for section, questions in sections.items():
+            for raw in questions:
+                yield normalize_question(raw, SOURCE_ENHANCED, section, framework)
+
+    if HAS_PHD_CONTENT:
+        for raw in PHD_QUESTIONS_POOL:
+            yield normalize_question(raw, SOURCE_PHD, raw.get("topic", "PhD"))
+
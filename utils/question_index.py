@@ -0,0 +1,50 @@
+"""
+Multi-key index over the question bank
+"""
+from itertools import product
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Sequence, Tuple
+
+
+class QuestionIndex:
+    """Posting lists of question positions for every combination of source, topic, difficulty and framework
+
+    Each question is filed under all 16 keys formed by its source, topic,
+    difficulty and framework with any of them left out (None), so a lookup
+    for any combination is a single dict access and generators sample the
+    posting list directly instead of scanning the bank.
+    """
+
+    def __init__(self, questions: Sequence):
+        """
+        Args:
+            questions: Items with source, topic, difficulty and framework attributes,
+                addressed by their position in the sequence
+        """
+        postings: Dict[Tuple[Optional[str], ...], list] = {}
+        strata: Dict[Tuple[Optional[str], ...], list] = {}
+        for position, question in enumerate(questions):
+            fields = (question.source, question.topic, question.difficulty, question.framework)
+            strata.setdefault(fields, []).append(position)
+            for key in product(*((value, None) for value in fields)):
+                # A question without a framework reaches the same key twice
+                posting = postings.setdefault(key, [])
+                if not posting or posting[-1] != position:
+                    posting.append(position)
+        self._postings = {key: tuple(posting) for key, posting in postings.items()}
+        # Unlike lookup(), a None framework here means questions without a framework
+        self._strata = MappingProxyType({key: tuple(posting) for key, posting in strata.items()})
+
+    def lookup(self, source: Optional[str] = None, topic: Optional[str] = None,
+               difficulty: Optional[str] = None, framework: Optional[str] = None) -> Sequence[int]:
+        """Positions of the questions matching every given field, in bank order"""
+        return self._postings.get((source, topic, difficulty, framework), ())
+
+    def topics(self, source: Optional[str] = None, framework: Optional[str] = None) -> Sequence[str]:
+        """Topics with at least one question of the source and framework (None for any), in bank order"""
+        return tuple(dict.fromkeys(key[1] for key in self._postings
+                                   if key[0] == source and key[3] == framework and key[1] is not None))
+
+    def strata(self) -> Mapping[Tuple[str, str, str, Optional[str]], Sequence[int]]:
+        """Positions by exact (source, topic, difficulty, framework)"""
+        return self._strata
@@ -0,0 +1,75 @@
+"""
+Due-card queue for spaced repetition reviews
+"""
+import heapq
+from typing import Dict, Iterator, List, Tuple
+
+
+class DueQueue:
+    """Flashcards ordered by next review time, one min-heap per difficulty level
+
+    Cards are keyed by their next review as an epoch timestamp, so finding the
+    due cards never parses a date. Updating a card pushes a new heap entry and
+    leaves the old one behind as stale; stale entries are skipped on reads and
+    dropped when they outnumber the live ones.
+    """
+
+    def __init__(self):
+        self._heaps: Dict[int, List[Tuple[float, int, str]]] = {}
+        self._entries: Dict[str, Tuple[float, int, int]] = {}
+        self._seq = 0
+        self._stale = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def update(self, term: str, next_review: float, difficulty_level: int):
+        """Schedule a card, replacing any earlier schedule for it"""
+        if term in self._entries:
+            self._stale += 1
+
+        self._seq += 1
+        self._entries[term] = (next_review, difficulty_level, self._seq)
+        heapq.heappush(self._heaps.setdefault(difficulty_level, []), (next_review, self._seq, term))
+
+        if self._stale > len(self._entries):
+            self._compact()
+
+    def due(self, now: float, limit: int) -> List[str]:
+        """Up to limit due cards, easiest level first and most overdue first within a level"""
+        result = []
+        for level in sorted(self._heaps):
+            for term in self._iter_due(self._heaps[level], now):
+                if len(result) >= limit:
+                    return result
+                result.append(term)
+        return result
+
+    def count_due(self, now: float) -> int:
+        """Number of cards whose review is due"""
+        return sum(1 for level in self._heaps for _ in self._iter_due(self._heaps[level], now))
+
+    def _iter_due(self, heap: List[Tuple[float, int, str]], now: float) -> Iterator[str]:
+        """Walk a heap in key order without popping, stopping at the first card not yet due"""
+        if not heap:
+            return
+
+        frontier = [(heap[0], 0)]
+        while frontier:
+            entry, index = heapq.heappop(frontier)
+            next_review, seq, term = entry
+            if next_review > now:
+                return
+            if self._entries.get(term, (None, None, None))[2] == seq:
+                yield term
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+
+    def _compact(self):
+        self._heaps = {}
+        for term, (next_review, level, seq) in self._entries.items():
+            self._heaps.setdefault(level, []).append((next_review, seq, term))
+        for heap in self._heaps.values():
+            heapq.heapify(heap)
+        self._stale = 0
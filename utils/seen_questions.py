@@ -0,0 +1,128 @@
+"""
+Questions a user has already been shown
+
+SeenQuestions keeps one bit per question bank position, so the test
+generators can put unseen questions first with a constant-time check per
+question. On disk it is the list of question ids in a small JSON file next
+to the user's progress file, which keeps it valid when the bank changes.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import Counter
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEEN_FILE_NAME = "seen_questions.json"
+
+
+def seen_questions_file(data_file: str) -> str:
+    """Path of the seen-questions file that belongs to a progress file"""
+    return os.path.join(os.path.dirname(data_file), SEEN_FILE_NAME)
+
+
+class SeenQuestions:
+    """Bitset of the bank positions a user has seen, persisted by question id"""
+
+    def __init__(self, bank, path: Optional[str] = None):
+        """
+        Args:
+            bank: The QuestionBank positions refer to
+            path: JSON file to load from and save to; None keeps it in memory
+        """
+        self.bank = bank
+        self.path = path
+        self._bits = bytearray((len(bank) + 7) // 8)
+        # Ids of every seen question, including ones no longer in the bank
+        self._ids = set()
+        # (source, topic, difficulty, framework) -> seen questions of that stratum
+        self._strata = Counter()
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, position: int) -> bool:
+        return bool(self._bits[position >> 3] & (1 << (position & 7)))
+
+    def mark(self, question_ids: Iterable[int]):
+        """Record questions as seen and save if any of them were new"""
+        with self._lock:
+            added = False
+            for question_id in question_ids:
+                if question_id in self._ids:
+                    continue
+                self._ids.add(question_id)
+                self._set(question_id)
+                added = True
+            if added:
+                self._save()
+
+    def count(self, stratum: Tuple) -> int:
+        """Number of seen questions in a question index stratum"""
+        return self._strata[stratum]
+
+    def split(self, positions: Sequence[int]) -> Tuple[List[int], List[int]]:
+        """(unseen, seen) positions, each in the given order"""
+        bits = self._bits
+        unseen, seen = [], []
+        for position in positions:
+            if bits[position >> 3] & (1 << (position & 7)):
+                seen.append(position)
+            else:
+                unseen.append(position)
+        return unseen, seen
+
+    def clear(self):
+        """Forget every seen question"""
+        with self._lock:
+            self._ids.clear()
+            self._strata.clear()
+            self._bits = bytearray(len(self._bits))
+            self._save()
+
+    def close(self):
+        """Nothing is buffered; every change is saved by mark() and clear()"""
+
+    def _set(self, question_id: int):
+        try:
+            position = self.bank.position(question_id)
+        except KeyError:
+            return
+        if position in self:
+            return
+        self._bits[position >> 3] |= 1 << (position & 7)
+        question = self.bank[position]
+        self._strata[(question.source, question.topic, question.difficulty, question.framework)] += 1
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                ids = json.load(f).get("question_ids", [])
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning("Ignoring unreadable seen questions file %s: %s", self.path, e)
+            return
+        for question_id in ids:
+            self._ids.add(question_id)
+            self._set(question_id)
+
+    def _save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path) or "."
+        fd, temp_file = tempfile.mkstemp(prefix=SEEN_FILE_NAME + ".", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"question_ids": sorted(self._ids)}, f)
+            os.replace(temp_file, self.path)
+        except OSError as e:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            logger.error("Could not save seen questions: %s", e)
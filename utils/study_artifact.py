@@ -0,0 +1,161 @@
+"""
+Compiled study data artifact
+
+The data modules build their dicts and lists from literals on every call,
+and the question bank normalizes every question source. compile_artifact()
+does all of that once and pickles the results into ARTIFACT_FILE, tagged
+with a hash of the source files. load_artifact() reads the file once per
+process and recompiles it whenever the hash no longer matches, so editing a
+data module needs no manual step. To build it ahead of time, for example
+while deploying, run:
+
+    python -m utils.study_artifact
+
+The loaded data is shared by every session and frozen: mappings are
+read-only and lists become tuples.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from dataclasses import fields
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+from data.study_data import get_topics as _source_topics
+from data.study_data import get_flashcards as _source_flashcards
+from data.study_data import get_summary_data as _source_summary_data
+from data.study_data import get_difficulty_levels as _source_difficulty_levels
+from utils.question_bank import Question, QuestionBank, iter_source_questions
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of the artifact changes
+ARTIFACT_VERSION = 1
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARTIFACT_FILE = os.path.join(ROOT_DIR, "data", "compiled", "study_data.pickle")
+
+# Files whose content decides the artifact, relative to ROOT_DIR
+SOURCE_FILES = (
+    "data/study_data.py",
+    "data/enhanced_study_data.py",
+    "data/phd_level_study_data.py",
+    "utils/question_bank.py",
+)
+
+
+def source_hash(root_dir: str = ROOT_DIR) -> str:
+    """Hash of the artifact version and every source file"""
+    digest = hashlib.sha256(f"study-artifact-{ARTIFACT_VERSION}".encode())
+    for name in SOURCE_FILES:
+        digest.update(name.encode())
+        with open(os.path.join(root_dir, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def build_artifact(hash_value: str) -> Dict[str, Any]:
+    """Run every data getter and normalize the question bank"""
+    bank = QuestionBank(iter_source_questions())
+    names = [field.name for field in fields(Question)]
+    return {
+        "version": ARTIFACT_VERSION,
+        "source_hash": hash_value,
+        "topics": _source_topics(),
+        "difficulty_levels": _source_difficulty_levels(),
+        "flashcards": _source_flashcards(),
+        "summary_data": _source_summary_data(),
+        # Questions as plain field tuples, in bank order
+        "questions": [tuple(getattr(question, name) for name in names) for question in bank],
+    }
+
+
+def compile_artifact(path: str = ARTIFACT_FILE, hash_value: Optional[str] = None) -> Dict[str, Any]:
+    """Build the artifact and write it atomically to path"""
+    artifact = build_artifact(hash_value or source_hash())
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return artifact
+
+
+def read_artifact(path: str, hash_value: str) -> Optional[Dict[str, Any]]:
+    """The artifact at path, or None if it is missing, unreadable or stale"""
+    try:
+        with open(path, "rb") as f:
+            artifact = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("Ignoring unreadable study data artifact %s: %s", path, e)
+        return None
+
+    if (not isinstance(artifact, dict) or artifact.get("version") != ARTIFACT_VERSION
+            or artifact.get("source_hash") != hash_value):
+        return None
+    return artifact
+
+
+@lru_cache(maxsize=None)
+def load_artifact() -> Mapping[str, Any]:
+    """The process-wide study data, compiled first if missing or stale"""
+    hash_value = source_hash()
+    artifact = read_artifact(ARTIFACT_FILE, hash_value)
+    if artifact is None:
+        try:
+            artifact = compile_artifact(ARTIFACT_FILE, hash_value)
+        except OSError as e:
+            # A read-only install still works, it just compiles on every start
+            logger.warning("Could not write study data artifact: %s", e)
+            artifact = build_artifact(hash_value)
+    return _freeze(artifact)
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def get_topics() -> Mapping[str, int]:
+    """Topic -> weight, as data.study_data.get_topics()"""
+    return load_artifact()["topics"]
+
+
+def get_difficulty_levels() -> Mapping[str, str]:
+    """Difficulty level -> description, as data.study_data.get_difficulty_levels()"""
+    return load_artifact()["difficulty_levels"]
+
+
+def get_flashcards() -> Mapping[str, str]:
+    """Term -> definition, as data.study_data.get_flashcards()"""
+    return load_artifact()["flashcards"]
+
+
+def get_summary_data() -> Mapping[str, Any]:
+    """Summary sheets by category, as data.study_data.get_summary_data()"""
+    return load_artifact()["summary_data"]
+
+
+@lru_cache(maxsize=None)
+def load_question_bank() -> QuestionBank:
+    """The process-wide question bank"""
+    return QuestionBank(Question(*row) for row in load_artifact()["questions"])
+
+
+if __name__ == "__main__":
+    compile_artifact()
+    print(f"Wrote {ARTIFACT_FILE}")
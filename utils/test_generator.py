@@ -1,205 +1,255 @@
 """
 Test generation utilities for creating mock tests
+
+Every generated paper comes from its own random.Random seeded per call and
+is stored in the process-wide paper cache under its configuration and seed,
+so a paper can be served again, shared or audited by its seed. A seed the
+caller passes reproduces the paper for anyone; without one a fresh seed is
+drawn and the user's unseen questions are preferred, so that paper is
+reproduced from the cache while it holds it.
 """
 import random
-from typing import Dict, List, Any, Optional
-from data.study_data import get_topics, get_questions_by_topic, get_difficulty_levels
-from data.enhanced_study_data import (
-    get_progressive_openai_sdk_questions,
-    get_enhanced_building_agents_questions,
-    get_enhanced_mcp_questions,
-    PHD_QUESTIONS_POOL,
-    HAS_PHD_CONTENT
-)
+import re
+import secrets
+from typing import Callable, Dict, List, Any, Optional, Sequence, Set, Tuple
+from utils.blueprint import DIFFICULTY, Blueprint, allocate, draw, marginal, sample_strata
+from utils.paper_cache import PaperCache, shared_paper_cache
+from utils.question_bank import FRAMEWORK_TOPICS, SOURCE_PHD, SOURCE_TOPIC, Paper, PaperQuestion
+from utils.study_artifact import get_topics, get_difficulty_levels, load_question_bank
+
+# Certification tests: share of questions per difficulty, in percent
+CERTIFICATION_MIX = {"Normal": 20, "Intermediate": 25, "Advanced": 25, "PhD": 20, "God Level": 10}
+
+# Bits of the seeds drawn for papers requested without one
+SEED_BITS = 32
+
+# Words that say nothing about how two topic names are related
+_TOPIC_STOP_WORDS = {"and", "the", "of", "to", "in", "for", "with", "level", "understanding", "advanced",
+                     "fundamentals", "fundamental", "core", "concepts", "principles", "basic", "implementation"}
+
+
+def _topic_words(topic: str) -> Set[str]:
+    words = set()
+    for word in re.findall(r"[a-z]+", topic.lower()):
+        if word not in _TOPIC_STOP_WORDS:
+            words.add(word[:-1] if len(word) > 3 and word.endswith("s") else word)
+    return words
 
 class TestGenerator:
-    def __init__(self):
+    def __init__(self, shuffle_options: bool = False, seen=None, paper_cache: Optional[PaperCache] = None):
+        """
+        Args:
+            shuffle_options: Show the options of every question in a random order
+            seen: SeenQuestions of the user; unseen questions are picked first in unseeded papers
+            paper_cache: Where generated papers are stored; defaults to the process-wide cache
+        """
+        self.shuffle_options = shuffle_options
+        self.seen = seen
+        self.paper_cache = paper_cache if paper_cache is not None else shared_paper_cache()
         self.topics = get_topics()
-        self.questions_pool = get_questions_by_topic()
         self.difficulty_levels = get_difficulty_levels()
-        self.frameworks = {
-            "Building Effective Agents": ["Agent Architecture", "Design Patterns", "Memory Systems", "Tool Integration", "Retrieval Systems", "Economic Integration"],
-            "Model Context Protocol (MCP)": ["MCP Fundamentals", "Transport Layers", "HTTP Theory", "REST Architecture", "JSON-RPC", "Security", "MCP OpenAI Integration"],
-            "OpenAI Agents SDK": ["OpenAI Agents SDK Fundamentals", "OpenAI Agents Implementation", "OpenAI Tools and Functions", "OpenAI Handoffs and Multi-Agent", "OpenAI Sessions and State", "OpenAI Guardrails and Security", "OpenAI Tracing and Monitoring"]
-        }
+        self.frameworks = {framework: list(topics) for framework, topics in FRAMEWORK_TOPICS.items()}
+        
+        # Shared, immutable bank of every question source
+        self.bank = load_question_bank()
+        self.index = self.bank.index
+        # Difficulty -> positions used by generate_difficulty_test, filled on first use
+        self._difficulty_postings: Dict[str, List[int]] = {}
+        # Topic -> related topics, filled on first use
+        self._related_topics: Dict[str, List[str]] = {}
+    
+    def _fill(self, tiers: Sequence[Sequence[int]], count: int, taken: Set[int], rng: random.Random, seen) -> List[int]:
+        """Up to count positions from the first tiers that have any left, never repeating one in taken"""
+        selected = []
+        for positions in tiers:
+            if len(selected) >= count:
+                break
+            selected += draw(positions, count - len(selected), taken, rng, seen)
+        return selected
+    
+    def related_topics(self, topic: str) -> List[str]:
+        """Topics to fill a short topic test from, closest first
+        
+        The topic itself in every source, then topics whose names share words
+        with it, then the other topics of its frameworks.
+        """
+        related = self._related_topics.get(topic)
+        if related is None:
+            words = _topic_words(topic)
+            scored = []
+            for other in self.index.topics():
+                other_words = _topic_words(other)
+                shared = len(words & other_words)
+                if other != topic and shared:
+                    scored.append((-shared / len(words | other_words), other))
+            
+            frameworks = {framework for framework, topics in self.frameworks.items() if topic in topics}
+            frameworks.update(self.bank[position].framework for position in self.index.lookup(topic=topic))
+            by_framework = [other for framework in sorted(filter(None, frameworks))
+                            for other in self.index.topics(framework=framework)]
+            
+            related = list(dict.fromkeys([topic] + [other for _, other in sorted(scored)] + by_framework))
+            self._related_topics[topic] = related
+        return related
+    
+    def _generate(self, config: Tuple, seed: Optional[int],
+                  select: Callable[[random.Random, Any], Sequence[int]]) -> Paper:
+        """The paper for a configuration and seed, from the paper cache or generated by select
         
-        # Enhanced progressive question pools
-        self.enhanced_questions = {
-            "OpenAI Agents SDK": get_progressive_openai_sdk_questions(),
-            "Building Effective Agents": get_enhanced_building_agents_questions(),
-            "Model Context Protocol (MCP)": get_enhanced_mcp_questions()
-        }
+        Args:
+            config: Hashable generator method name and arguments
+            seed: Seed of the paper; None draws a new one and prefers unseen questions
+            select: Picks bank positions given the paper's Random and SeenQuestions (or None)
+        """
+        seen = None
+        if seed is None:
+            seed = secrets.randbits(SEED_BITS)
+            if self.seen is not None and len(self.seen):
+                seen = self.seen
+        key = (config, self.shuffle_options, seed)
+        
+        if seen is None:
+            # A requested seed gives the same paper whoever asks for it
+            record = self.paper_cache.get(key)
+            paper = self._rebuild(record) if record is not None else None
+            if paper is not None:
+                return Paper(paper, config, seed)
+        
+        paper = self._draw(seed, select, seen)
+        # The recorded ids reproduce the paper without the seen set it was drawn with
+        self.paper_cache.put(key, (tuple(question.id for question in paper),
+                                   tuple(question.permutation for question in paper) if self.shuffle_options else None))
+        return Paper(paper, config, seed)
+    
+    def _draw(self, seed: int, select: Callable[[random.Random, Any], Sequence[int]], seen) -> List[PaperQuestion]:
+        """Shuffle the positions select picks with Random(seed) into a numbered test that refers to the shared bank"""
+        rng = random.Random(seed)
+        positions = list(select(rng, seen))
+        rng.shuffle(positions)
+        
+        paper = []
+        for number, position in enumerate(positions, 1):
+            question = self.bank[position]
+            permutation = None
+            if self.shuffle_options:
+                permutation = tuple(rng.sample(range(len(question.options)), len(question.options)))
+            paper.append(PaperQuestion(question, number, permutation))
+        return paper
     
-    def generate_mock_test(self, total_questions: int = 120, custom_distribution: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+    def _rebuild(self, record) -> Optional[List[PaperQuestion]]:
+        """A cached paper as PaperQuestions, or None if one of its questions left the bank"""
+        question_ids, permutations = record
+        paper = []
+        for number, question_id in enumerate(question_ids, 1):
+            question = self.bank.get(question_id)
+            if question is None:
+                return None
+            paper.append(PaperQuestion(question, number, permutations[number - 1] if permutations else None))
+        return paper
+    
+    def generate_mock_test(self, total_questions: int = 120, custom_distribution: Optional[Dict[str, int]] = None,
+                           seed: Optional[int] = None) -> Paper:
         """
         Generate a mock test with specified number of questions
         
         Args:
             total_questions: Total number of questions for the test
             custom_distribution: Custom distribution of questions per topic
+            seed: Seed of an earlier paper to reproduce; None for a new paper
         
         Returns:
-            List of question dictionaries
+            Paper of PaperQuestion, read like question dictionaries
         """
+        distribution = None if custom_distribution is None else tuple(sorted(custom_distribution.items()))
+        return self._generate(("mock", total_questions, distribution), seed,
+                              lambda rng, seen: self._mock_positions(total_questions, custom_distribution, rng, seen))
+    
+    def _mock_positions(self, total_questions: int, custom_distribution: Optional[Dict[str, int]],
+                        rng: random.Random, seen) -> List[int]:
         if custom_distribution is None:
             # Use default distribution from topics
-            distribution = self._calculate_distribution(total_questions)
+            blueprint = Blueprint(total_questions, topics=self.topics, sources=(SOURCE_TOPIC,))
         else:
-            distribution = custom_distribution
-        
-        test_questions = []
-        
-        for topic, num_questions in distribution.items():
-            if topic in self.questions_pool:
-                topic_questions = self.questions_pool[topic]
-                
-                # If we need more questions than available, repeat some
-                if num_questions > len(topic_questions):
-                    selected = topic_questions * (num_questions // len(topic_questions) + 1)
-                    selected = selected[:num_questions]
-                else:
-                    selected = random.sample(topic_questions, min(num_questions, len(topic_questions)))
-                
-                # Add topic information to each question
-                for question in selected:
-                    question_copy = question.copy()
-                    question_copy['topic'] = topic
-                    test_questions.append(question_copy)
-        
-        # Shuffle the final test questions
-        random.shuffle(test_questions)
-        
-        # Add question numbers
-        for i, question in enumerate(test_questions, 1):
-            question['question_number'] = i
-        
-        return test_questions
+            blueprint = Blueprint(sum(custom_distribution.values()), topics=custom_distribution, sources=(SOURCE_TOPIC,))
+        
+        taken: Set[int] = set()
+        selected_positions = self._sample_blueprint(blueprint, rng, seen, taken)
+        
+        # Fill a shortfall from related topics in every source, then from the whole bank
+        shortfall = blueprint.total - len(selected_positions)
+        if shortfall > 0:
+            related_weights: Dict[str, float] = {}
+            for topic, weight in blueprint.topics.items():
+                for related in self.related_topics(topic):
+                    related_weights[related] = max(related_weights.get(related, 0), weight)
+            selected_positions += self._sample_blueprint(Blueprint(shortfall, topics=related_weights), rng, seen, taken)
+        shortfall = blueprint.total - len(selected_positions)
+        if shortfall > 0:
+            selected_positions += self._sample_blueprint(Blueprint(shortfall), rng, seen, taken)
+        return selected_positions
     
-    def _calculate_distribution(self, total_questions: int) -> Dict[str, int]:
-        """Calculate question distribution based on topic weights"""
-        total_weight = sum(self.topics.values())
-        distribution = {}
-        
-        for topic, weight in self.topics.items():
-            questions_for_topic = round((weight / total_weight) * total_questions)
-            distribution[topic] = questions_for_topic
-        
-        # Adjust for rounding errors
-        current_total = sum(distribution.values())
-        if current_total != total_questions:
-            # Add or remove questions from the largest topic
-            if distribution:
-                largest_topic = max(distribution.keys(), key=lambda k: distribution[k])
-                distribution[largest_topic] = max(0, distribution[largest_topic] + (total_questions - current_total))
-        
-        return distribution
+    def _sample_blueprint(self, blueprint: Blueprint, rng: random.Random, seen,
+                          taken: Optional[Set[int]] = None) -> List[int]:
+        """Positions for a blueprint, drawn stratum by stratum with exact quotas and never from taken"""
+        taken = set() if taken is None else taken
+        strata = self.index.strata()
+        sizes = {stratum: len(positions) for stratum, positions in strata.items()}
+        for position in taken:
+            question = self.bank[position]
+            sizes[(question.source, question.topic, question.difficulty, question.framework)] -= 1
+        preferred = None
+        if seen is not None:
+            preferred = {stratum: size - seen.count(stratum) for stratum, size in sizes.items()}
+        return sample_strata(allocate(blueprint, sizes, preferred), strata, rng, taken, seen)
     
-    def generate_framework_test(self, framework: str, difficulty: Optional[str] = None, num_questions: int = 50) -> List[Dict[str, Any]]:
+    def generate_framework_test(self, framework: str, difficulty: Optional[str] = None, num_questions: int = 50,
+                                seed: Optional[int] = None) -> Paper:
         """Generate test for specific framework and difficulty"""
         if framework not in self.frameworks:
-            return []
-        
-        relevant_topics = self.frameworks[framework]
-        test_questions = []
-        
-        for topic in relevant_topics:
-            if topic in self.questions_pool:
-                topic_questions = self.questions_pool[topic]
-                
-                # Filter by difficulty if specified
-                if difficulty and difficulty != "All Levels":
-                    topic_questions = [q for q in topic_questions if q.get('difficulty') == difficulty]
-                
-                # Add framework questions
-                for question in topic_questions:
-                    question_copy = question.copy()
-                    question_copy['topic'] = topic
-                    question_copy['framework'] = framework
-                    test_questions.append(question_copy)
-        
-        # Limit to requested number
-        if len(test_questions) > num_questions:
-            test_questions = random.sample(test_questions, num_questions)
-        
-        random.shuffle(test_questions)
-        
-        for i, question in enumerate(test_questions, 1):
-            question['question_number'] = i
-        
-        return test_questions
+            return Paper()
+        
+        if not difficulty or difficulty == "All Levels":
+            difficulty = None
+        # Every source, the PhD questions of the framework included
+        positions = self.index.lookup(difficulty=difficulty, framework=framework)
+        return self._generate(("framework", framework, difficulty, num_questions), seed,
+                              lambda rng, seen: draw(positions, num_questions, set(), rng, seen))
     
-    def generate_phd_test(self, framework: str = "All", difficulty: str = "PhD", num_questions: int = 50) -> List[Dict[str, Any]]:
+    def generate_phd_test(self, framework: str = "All", difficulty: str = "PhD", num_questions: int = 50,
+                          seed: Optional[int] = None) -> Paper:
         """Generate PhD-level test with ultra-detailed questions"""
-        if not HAS_PHD_CONTENT:
-            return []
-            
-        phd_questions = []
-        
-        # Filter PhD questions by framework if specified
-        if framework != "All":
-            framework_map = {
-                "Building Effective Agents": "Building Effective Agents",
-                "Model Context Protocol (MCP)": "MCP", 
-                "OpenAI Agents SDK": "OpenAI Agents SDK"
-            }
-            target_framework = framework_map.get(framework)
-            if target_framework:
-                phd_questions = [q for q in PHD_QUESTIONS_POOL if q.get('framework') == target_framework]
-        else:
-            phd_questions = PHD_QUESTIONS_POOL.copy()
+        if framework != "All" and framework not in self.frameworks:
+            return Paper()
         
-        # Filter by difficulty
-        if difficulty != "All Levels":
-            phd_questions = [q for q in phd_questions if q.get('difficulty') == difficulty]
-        
-        # Sample requested number of questions
-        if len(phd_questions) > num_questions:
-            phd_questions = random.sample(phd_questions, num_questions)
-        
-        # Add metadata and shuffle
-        for i, question in enumerate(phd_questions, 1):
-            question['question_number'] = i
-            if not question.get('framework'):
-                question['framework'] = framework if framework != "All" else "Multi-Framework"
-        
-        random.shuffle(phd_questions)
-        return phd_questions
+        positions = self.index.lookup(SOURCE_PHD, difficulty=None if difficulty == "All Levels" else difficulty,
+                                      framework=None if framework == "All" else framework)
+        return self._generate(("phd", framework, difficulty, num_questions), seed,
+                              lambda rng, seen: draw(positions, num_questions, set(), rng, seen))
     
-    def generate_comprehensive_certification_test(self, framework: str, total_questions: int = 120) -> List[Dict[str, Any]]:
+    def generate_comprehensive_certification_test(self, framework: str, total_questions: int = 120,
+                                                  seed: Optional[int] = None) -> Paper:
         """Generate comprehensive certification-level test combining all difficulty levels"""
-        test_questions = []
-        
-        # Distribution: 20% Normal, 25% Intermediate, 25% Advanced, 20% PhD, 10% God Level
-        distribution = {
-            "Normal": int(total_questions * 0.20),
-            "Intermediate": int(total_questions * 0.25), 
-            "Advanced": int(total_questions * 0.25),
-            "PhD": int(total_questions * 0.20),
-            "God Level": int(total_questions * 0.10)
-        }
-        
-        # Adjust for rounding
-        actual_total = sum(distribution.values())
-        if actual_total < total_questions:
-            distribution["Advanced"] += total_questions - actual_total
+        if framework not in self.frameworks:
+            return Paper()
         
-        for difficulty, num_q in distribution.items():
-            if difficulty in ["PhD", "God Level"] and HAS_PHD_CONTENT:
-                # Use PhD-level questions
-                phd_q = self.generate_phd_test(framework, difficulty, num_q)
-                test_questions.extend(phd_q)
-            else:
-                # Use regular framework test
-                framework_q = self.generate_framework_test(framework, difficulty, num_q)
-                test_questions.extend(framework_q[:num_q])
+        blueprint = Blueprint(total_questions, difficulties=CERTIFICATION_MIX, frameworks={framework: 1})
+        return self._generate(("certification", framework, total_questions), seed,
+                              lambda rng, seen: self._sample_blueprint(blueprint, rng, seen))
+    
+    def get_certification_distribution(self, framework: str, total_questions: int) -> Dict[str, int]:
+        """Number of questions per difficulty a certification test of total_questions will hold
         
-        random.shuffle(test_questions)
+        The counts come from the same allocation the test is drawn with, so
+        they add up to less than total_questions when the bank holds fewer
+        questions of the framework.
+        """
+        if framework not in self.frameworks:
+            return {difficulty: 0 for difficulty in CERTIFICATION_MIX}
         
-        # Renumber questions
-        for i, question in enumerate(test_questions, 1):
-            question['question_number'] = i
-            
-        return test_questions
+        blueprint = Blueprint(total_questions, difficulties=CERTIFICATION_MIX, frameworks={framework: 1})
+        sizes = {stratum: len(positions) for stratum, positions in self.index.strata().items()}
+        by_difficulty = marginal(allocate(blueprint, sizes), DIFFICULTY)
+        return {difficulty: by_difficulty.get(difficulty, 0) for difficulty in CERTIFICATION_MIX}
     
     def get_available_frameworks(self) -> List[str]:
         """Get list of available frameworks"""
@@ -209,27 +259,13 @@ class TestGenerator:
         """Get topics for a specific framework"""
         return self.frameworks.get(framework, [])
     
-    def generate_topic_test(self, topic: str, num_questions: int = 10) -> List[Dict[str, Any]]:
+    def generate_topic_test(self, topic: str, num_questions: int = 10, seed: Optional[int] = None) -> Paper:
         """Generate a test focused on a specific topic"""
-        if topic not in self.questions_pool:
-            return []
-        
-        topic_questions = self.questions_pool[topic]
-        
-        # Select questions (with repetition if needed)
-        if num_questions > len(topic_questions):
-            selected = topic_questions * (num_questions // len(topic_questions) + 1)
-            selected = selected[:num_questions]
-        else:
-            selected = random.sample(topic_questions, min(num_questions, len(topic_questions)))
-        
-        # Add metadata
-        for i, question in enumerate(selected, 1):
-            question['topic'] = topic
-            question['question_number'] = i
-        
-        random.shuffle(selected)
-        return selected
+        # The topic pool first, then related topics for what it cannot supply
+        tiers = [self.index.lookup(SOURCE_TOPIC, topic)]
+        tiers += [self.index.lookup(topic=related) for related in self.related_topics(topic)]
+        return self._generate(("topic", topic, num_questions), seed,
+                              lambda rng, seen: self._fill(tiers, num_questions, set(), rng, seen))
     
     def get_available_topics(self) -> List[str]:
         """Get list of available topics for testing"""
@@ -237,7 +273,24 @@ class TestGenerator:
     
     def get_topic_question_count(self, topic: str) -> int:
         """Get number of available questions for a topic"""
-        return len(self.questions_pool.get(topic, []))
+        return len(self.index.lookup(SOURCE_TOPIC, topic))
+    
+    def get_topic_test_capacity(self, topic: str, limit: int) -> int:
+        """Number of distinct questions a topic test can hold, counting related topics, up to limit"""
+        positions: Set[int] = set()
+        for related in self.related_topics(topic):
+            positions.update(self.index.lookup(topic=related))
+            if len(positions) >= limit:
+                return limit
+        return len(positions)
+    
+    def get_mock_test_capacity(self, total_questions: int) -> int:
+        """Number of distinct questions a mock test of total_questions will hold
+        
+        Shortfalls are filled from related topics and then the whole bank, so
+        only the size of the bank limits it.
+        """
+        return min(total_questions, len(self.bank))
     
     def filter_questions_by_difficulty(self, questions: List[Dict[str, Any]], difficulty: str) -> List[Dict[str, Any]]:
         """Filter questions by difficulty level"""
@@ -252,33 +305,30 @@ class TestGenerator:
         
         return filtered
     
-    def generate_difficulty_test(self, difficulty: str, total_questions: int = 50) -> List[Dict[str, Any]]:
+    def generate_difficulty_test(self, difficulty: str, total_questions: int = 50, seed: Optional[int] = None) -> Paper:
         """Generate a test focused on a specific difficulty level"""
-        all_questions = []
-        
-        # Collect all questions from all topics
-        for topic, questions in self.questions_pool.items():
-            filtered_questions = self.filter_questions_by_difficulty(questions, difficulty)
-            for question in filtered_questions:
-                question_copy = question.copy()
-                question_copy['topic'] = topic
-                all_questions.append(question_copy)
-        
-        if not all_questions:
-            return []
-        
-        # Select random questions up to the total requested
-        if total_questions >= len(all_questions):
-            selected = all_questions.copy()
-        else:
-            selected = random.sample(all_questions, total_questions)
-        
-        # Add question numbers and shuffle
-        random.shuffle(selected)
-        for i, question in enumerate(selected, 1):
-            question['question_number'] = i
+        positions = self._difficulty_positions(difficulty)
+        return self._generate(("difficulty", difficulty, total_questions), seed,
+                              lambda rng, seen: draw(positions, total_questions, set(), rng, seen))
+    
+    def _difficulty_positions(self, difficulty: str) -> List[int]:
+        """Questions of a difficulty from every source
         
-        return selected
+        Topic pool topics without any question of that difficulty contribute
+        their whole pool, the same selection as filter_questions_by_difficulty.
+        """
+        if difficulty == "All":
+            return self.index.lookup()
+        
+        positions = self._difficulty_postings.get(difficulty)
+        if positions is None:
+            positions = []
+            for topic in self.index.topics(SOURCE_TOPIC):
+                positions.extend(self.index.lookup(SOURCE_TOPIC, topic, difficulty) or self.index.lookup(SOURCE_TOPIC, topic))
+            positions.extend(position for position in self.index.lookup(difficulty=difficulty)
+                             if self.bank[position].source != SOURCE_TOPIC)
+            self._difficulty_postings[difficulty] = positions
+        return positions
     
     def get_available_difficulties(self) -> List[str]:
         """Get list of available difficulty levels"""
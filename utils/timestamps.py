@@ -0,0 +1,53 @@
+"""
+Epoch-millisecond timestamps used by the progress data model
+
+Progress data stores every point in time as integer milliseconds since the
+epoch. ISO strings only appear when data is displayed or exported, and when
+files written before schema version 2 are upgraded.
+"""
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def now_ms() -> int:
+    """Current time in epoch milliseconds"""
+    return time.time_ns() // 1_000_000
+
+
+def to_epoch_ms(value: Any) -> Optional[int]:
+    """Convert an ISO string, datetime or number to epoch milliseconds
+
+    Naive ISO strings and datetimes are taken as local time, matching how
+    they were written. None stays None.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return round(value.timestamp() * 1000)
+
+
+def from_epoch_ms(ms: int) -> datetime:
+    """Local naive datetime for an epoch-millisecond timestamp"""
+    return datetime.fromtimestamp(ms / 1000)
+
+
+def to_iso(ms: Optional[int]) -> Optional[str]:
+    """ISO string for an epoch-millisecond timestamp, for display and export"""
+    if ms is None:
+        return None
+    return from_epoch_ms(ms).isoformat()
+
+
+def with_iso(record: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    """Copy of record with the given timestamp fields rendered as ISO strings"""
+    result = dict(record)
+    for field in fields:
+        if field in result:
+            result[field] = to_iso(result[field])
+    return result